@@ -3,24 +3,161 @@ Agent 8: Application Tracker
 Tracks job applications using SQLite database and generates analytics.
 """
 
+import copy
+import csv
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict
-import json
+
+
+# SQL kept as module-level constants so every call hits the connection's
+# statement cache instead of re-preparing the query.
+
+# Match score bucket used for the dashboard distribution chart
+SCORE_BUCKET_SQL = '''
+    CASE 
+        WHEN {score} >= 90 THEN '90-100%'
+        WHEN {score} >= 80 THEN '80-89%'
+        WHEN {score} >= 70 THEN '70-79%'
+        ELSE 'Below 70%'
+    END
+'''
+
+# Per-row changes to the stats_summary counters, applied by the triggers below
+ADD_TO_SUMMARY_SQL = '''
+    INSERT INTO stats_summary (dimension, bucket, count)
+    VALUES ('source', COALESCE({row}.source, ''), 1), ('company', {row}.company, 1)
+    ON CONFLICT(dimension, bucket) DO UPDATE SET count = count + 1;
+    INSERT INTO stats_summary (dimension, bucket, count)
+    SELECT 'match_score', {bucket}, 1 WHERE {row}.match_score IS NOT NULL
+    ON CONFLICT(dimension, bucket) DO UPDATE SET count = count + 1;
+'''
+
+REMOVE_FROM_SUMMARY_SQL = '''
+    UPDATE stats_summary SET count = count - 1
+    WHERE (dimension = 'source' AND bucket = COALESCE({row}.source, ''))
+       OR (dimension = 'company' AND bucket = {row}.company)
+       OR (dimension = 'match_score' AND {row}.match_score IS NOT NULL AND bucket = {bucket});
+    DELETE FROM stats_summary WHERE count <= 0;
+'''
+
+UPDATE_STATUS_SQL = '''
+    UPDATE applications 
+    SET status = ?
+    WHERE id = ?
+'''
+
+INSERT_APPLICATION_SQL = '''
+    INSERT INTO applications 
+    (job_id, job_title, company, location, salary_range, match_score, source, job_url, notes)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SELECT_ID_BY_JOB_ID_SQL = '''
+    SELECT id FROM applications
+    WHERE job_id = ?
+'''
+
+IMPORT_APPLICATION_SQL = '''
+    INSERT INTO applications 
+    (job_id, job_title, company, location, salary_range, match_score, source, job_url, notes,
+     date_applied, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, 'Applied'))
+'''
+
+# Appended to the INSERTs above once idx_app_job_id exists
+SKIP_TRACKED_JOB_ID_SQL = "ON CONFLICT(job_id) WHERE job_id != '' DO NOTHING"
+
+SELECT_ALL_APPLICATIONS_SQL = '''
+    SELECT * FROM applications
+    ORDER BY date_applied DESC
+'''
+
+CHECK_APPLIED_SQL = '''
+    SELECT 1 FROM applications
+    WHERE job_title = ? AND company = ?
+    LIMIT 1
+'''
+
+INSERT_CV_UPLOAD_SQL = '''
+    INSERT INTO cv_uploads (filename, ats_score)
+    VALUES (?, ?)
+'''
 
 
 class ApplicationTracker:
     """Tracks job applications and generates analytics."""
     
+    # Seconds a computed dashboard stats dict is served before recomputing
+    STATS_CACHE_TTL = 60
+    
+    # Number of pooled read-only connections shared by request threads
+    READ_POOL_SIZE = 4
+    
     def __init__(self, db_path: str = "job_applications.db"):
         self.db_path = db_path
+        # Long-lived connections keep SQLite's page cache warm between requests.
+        # WAL allows one writer alongside many readers, so writes go through a
+        # single lock-guarded connection while reads draw from a pool.
+        self._write_conn = self._open_connection()
+        self._write_lock = threading.Lock()
         self._initialize_database()
+        
+        self._read_pool = queue.Queue()
+        for _ in range(self.READ_POOL_SIZE):
+            self._read_pool.put(self._open_connection())
+        
+        self._stats_lock = threading.Lock()
+        self._stats_cache = None
+        self._stats_cache_ts = 0.0
+        self._stats_generation = 0
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a connection with WAL so dashboard reads don't block behind writes, and relaxed fsyncs."""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-20000')  # ~20MB page cache
+        cursor.execute('PRAGMA mmap_size=268435456')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        return conn
+    
+    @contextmanager
+    def _reader(self):
+        """Borrow a read connection from the pool for the duration of the block."""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+    
+    def _invalidate_stats(self):
+        """Drop cached dashboard stats once a write to the applications table has committed."""
+        with self._stats_lock:
+            self._stats_cache = None
+            self._stats_generation += 1
+    
+    def close(self):
+        """Close the writer and all pooled read connections."""
+        with self._write_lock:
+            self._write_conn.execute('PRAGMA optimize')
+            self._write_conn.close()
+        for _ in range(self.READ_POOL_SIZE):
+            self._read_pool.get().close()
     
     def _initialize_database(self):
         """Create database tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self._write_lock, self._write_conn:
+            self._create_tables(self._write_conn.cursor())
+    
+    def _create_tables(self, cursor: sqlite3.Cursor):
+        """Create the applications and cv_uploads tables and their indexes."""
         # Applications table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS applications (
@@ -55,24 +192,71 @@ class ApplicationTracker:
             )
         ''')
         
-        conn.commit()
-        conn.close()
+        # Indexes for check_if_applied lookups and dashboard aggregations
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_title_company ON applications(job_title, company)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_source ON applications(source)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_date ON applications(date_applied)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_app_company ON applications(company)')
+        
+        # One application per job posting; INSERTs skip job_ids already tracked
+        self._insert_application_sql = INSERT_APPLICATION_SQL
+        self._import_application_sql = IMPORT_APPLICATION_SQL
+        try:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_app_job_id ON applications(job_id) WHERE job_id != ''")
+            self._insert_application_sql += SKIP_TRACKED_JOB_ID_SQL
+            self._import_application_sql += SKIP_TRACKED_JOB_ID_SQL
+        except sqlite3.IntegrityError:
+            pass  # Existing database already holds duplicate job_ids
+        
+        # Dashboard counters (by source, by company, by match score bucket),
+        # maintained by triggers so stats reads are primary-key lookups
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_summary (
+                dimension TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (dimension, bucket)
+            )
+        ''')
+        add_new = ADD_TO_SUMMARY_SQL.format(row='NEW', bucket=SCORE_BUCKET_SQL.format(score='NEW.match_score'))
+        remove_old = REMOVE_FROM_SUMMARY_SQL.format(row='OLD', bucket=SCORE_BUCKET_SQL.format(score='OLD.match_score'))
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_app_summary_insert AFTER INSERT ON applications
+            BEGIN {add_new} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_app_summary_delete AFTER DELETE ON applications
+            BEGIN {remove_old} END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_app_summary_update
+            AFTER UPDATE OF source, company, match_score ON applications
+            BEGIN {remove_old} {add_new} END
+        ''')
+        
+        # Rebuild the counters from scratch in case rows predate the triggers
+        cursor.execute('DELETE FROM stats_summary')
+        cursor.execute(f'''
+            INSERT INTO stats_summary (dimension, bucket, count)
+            SELECT 'source', COALESCE(source, ''), COUNT(*) FROM applications GROUP BY 2
+            UNION ALL
+            SELECT 'company', company, COUNT(*) FROM applications GROUP BY 2
+            UNION ALL
+            SELECT 'match_score', {SCORE_BUCKET_SQL.format(score='match_score')}, COUNT(*)
+            FROM applications WHERE match_score IS NOT NULL GROUP BY 2
+        ''')
+        
+        # Refresh planner statistics so the new indexes get picked up
+        cursor.execute('ANALYZE')
     
     def update_application_status(self, app_id: int, status: str) -> bool:
         """Update the status of an application."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE applications 
-                SET status = ?
-                WHERE id = ?
-            ''', (status, app_id))
-            
-            updated = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
+            with self._write_lock, self._write_conn:
+                cursor = self._write_conn.cursor()
+                cursor.execute(UPDATE_STATUS_SQL, (status, app_id))
+                updated = cursor.rowcount > 0
+            self._invalidate_stats()
             
             return updated
         except Exception as e:
@@ -90,19 +274,51 @@ class ApplicationTracker:
         Returns:
             Application ID
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._write_lock, self._write_conn:
+            app_id = self._insert_application(self._write_conn.cursor(), self._application_row(job, notes))
+        self._invalidate_stats()
+        
+        return app_id
+    
+    def track_applications(self, jobs: List[Dict], notes: str = "") -> List[int]:
+        """
+        Record several job applications in a single transaction.
+        
+        Args:
+            jobs: List of job dictionaries
+            notes: Optional notes applied to every application
+            
+        Returns:
+            Application IDs, in the same order as jobs
+        """
+        if not jobs:
+            return []
+        
+        rows = [self._application_row(job, notes) for job in jobs]
+        
+        with self._write_lock, self._write_conn:
+            cursor = self._write_conn.cursor()
+            app_ids = [self._insert_application(cursor, row) for row in rows]
+        self._invalidate_stats()
         
+        return app_ids
+    
+    def _insert_application(self, cursor: sqlite3.Cursor, row: tuple) -> int:
+        """Insert an application row, returning the existing ID if its job_id is already tracked."""
+        cursor.execute(self._insert_application_sql, row)
+        if cursor.rowcount == 0:
+            cursor.execute(SELECT_ID_BY_JOB_ID_SQL, (row[0],))
+            return cursor.fetchone()[0]
+        return cursor.lastrowid
+    
+    def _application_row(self, job: Dict, notes: str) -> tuple:
+        """Build the INSERT parameters for a job application."""
         # Format salary range
         salary_range = None
         if job.get('salary_min') and job.get('salary_max'):
             salary_range = f"${job['salary_min']:,.0f} - ${job['salary_max']:,.0f}"
         
-        cursor.execute('''
-            INSERT INTO applications 
-            (job_id, job_title, company, location, salary_range, match_score, source, job_url, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        return (
             job.get('job_id', ''),
             job.get('title', ''),
             job.get('company', ''),
@@ -112,170 +328,178 @@ class ApplicationTracker:
             job.get('source', ''),
             job.get('redirect_url', ''),
             notes
-        ))
-        
-        app_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        return app_id
+        )
     
     def get_all_applications(self) -> List[Dict]:
         """Retrieve all applications."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM applications
-            ORDER BY date_applied DESC
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SELECT_ALL_APPLICATIONS_SQL)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
         
-        return [dict(row) for row in rows]
+        # Zip plain tuples against the column names; cheaper than sqlite3.Row -> dict
+        return [dict(zip(columns, row)) for row in rows]
     
     def get_application_stats(self) -> Dict:
-        """Generate application statistics for dashboard."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total applications
-        cursor.execute('SELECT COUNT(*) FROM applications')
-        total_applications = cursor.fetchone()[0]
-        
-        # Average match score
-        cursor.execute('SELECT AVG(match_score) FROM applications WHERE match_score IS NOT NULL')
-        avg_match_score = cursor.fetchone()[0] or 0
-        
-        # Last application date
-        cursor.execute('SELECT MAX(date_applied) FROM applications')
-        last_applied = cursor.fetchone()[0]
-        
-        # Applications by source
-        cursor.execute('''
-            SELECT source, COUNT(*) as count
-            FROM applications
-            GROUP BY source
-        ''')
-        by_source = dict(cursor.fetchall())
-        
-        # Applications over time (last 7 days)
-        cursor.execute('''
-            SELECT DATE(date_applied) as date, COUNT(*) as count
-            FROM applications
-            WHERE date_applied >= datetime('now', '-7 days')
-            GROUP BY DATE(date_applied)
-            ORDER BY date
-        ''')
-        applications_over_time = [
-            {'date': row[0], 'count': row[1]}
-            for row in cursor.fetchall()
-        ]
-        
-        # Match score distribution
-        cursor.execute('''
-            SELECT 
-                CASE 
-                    WHEN match_score >= 90 THEN '90-100%'
-                    WHEN match_score >= 80 THEN '80-89%'
-                    WHEN match_score >= 70 THEN '70-79%'
-                    ELSE 'Below 70%'
-                END as range,
-                COUNT(*) as count
-            FROM applications
-            WHERE match_score IS NOT NULL
-            GROUP BY range
-            ORDER BY range DESC
-        ''')
-        match_score_distribution = [
-            {'range': row[0], 'count': row[1]}
-            for row in cursor.fetchall()
-        ]
-        
-        # Top companies applied to
-        cursor.execute('''
-            SELECT company, COUNT(*) as count
-            FROM applications
-            GROUP BY company
-            ORDER BY count DESC
-            LIMIT 5
-        ''')
-        top_companies = [
-            {'company': row[0], 'count': row[1]}
-            for row in cursor.fetchall()
-        ]
+        """Generate application statistics for dashboard (cached for STATS_CACHE_TTL seconds)."""
+        with self._stats_lock:
+            if self._stats_cache is not None and time.monotonic() - self._stats_cache_ts < self.STATS_CACHE_TTL:
+                return copy.deepcopy(self._stats_cache)
+            generation = self._stats_generation
         
-        conn.close()
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            # Total applications, average match score and last application date
+            # in a single pass (AVG already skips NULL match scores)
+            cursor.execute('''
+                SELECT COUNT(*), AVG(match_score), MAX(date_applied)
+                FROM applications
+            ''')
+            total_applications, avg_match_score, last_applied = cursor.fetchone()
+            avg_match_score = avg_match_score or 0
         
-        return {
-            'total_applications': total_applications,
-            'avg_match_score': round(avg_match_score, 1),
-            'last_applied': last_applied,
-            'by_source': by_source,
-            'applications_over_time': applications_over_time,
-            'match_score_distribution': match_score_distribution,
-            'top_companies': top_companies
-        }
+            # Applications by source
+            cursor.execute('''
+                SELECT bucket, count
+                FROM stats_summary
+                WHERE dimension = 'source'
+            ''')
+            by_source = dict(cursor.fetchall())
+        
+            # Applications over time (last 7 days). The cutoff is bound as a
+            # parameter in SQLite's CURRENT_TIMESTAMP format (UTC) so the
+            # filter is a range scan on idx_app_date.
+            since = (datetime.now(timezone.utc) - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+            cursor.execute('''
+                SELECT DATE(date_applied) as date, COUNT(*) as count
+                FROM applications
+                WHERE date_applied >= ?
+                GROUP BY DATE(date_applied)
+                ORDER BY date
+            ''', (since,))
+            applications_over_time = [
+                {'date': row[0], 'count': row[1]}
+                for row in cursor.fetchall()
+            ]
+        
+            # Match score distribution
+            cursor.execute('''
+                SELECT bucket, count
+                FROM stats_summary
+                WHERE dimension = 'match_score'
+                ORDER BY bucket DESC
+            ''')
+            match_score_distribution = [
+                {'range': row[0], 'count': row[1]}
+                for row in cursor.fetchall()
+            ]
+        
+            # Top companies applied to
+            cursor.execute('''
+                SELECT bucket, count
+                FROM stats_summary
+                WHERE dimension = 'company'
+                ORDER BY count DESC, bucket
+                LIMIT 5
+            ''')
+            top_companies = [
+                {'company': row[0], 'count': row[1]}
+                for row in cursor.fetchall()
+            ]
+        
+            stats = {
+                'total_applications': total_applications,
+                'avg_match_score': round(avg_match_score, 1),
+                'last_applied': last_applied,
+                'by_source': by_source,
+                'applications_over_time': applications_over_time,
+                'match_score_distribution': match_score_distribution,
+                'top_companies': top_companies
+            }
+        
+        with self._stats_lock:
+            # Don't cache figures computed while a write was landing
+            if generation == self._stats_generation:
+                self._stats_cache = stats
+                self._stats_cache_ts = time.monotonic()
+        
+        return copy.deepcopy(stats)
     
     def check_if_applied(self, job: Dict) -> bool:
         """Check if already applied to this job."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM applications
-            WHERE job_title = ? AND company = ?
-        ''', (job.get('title', ''), job.get('company', '')))
-        
-        count = cursor.fetchone()[0]
-        conn.close()
+        with self._reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(CHECK_APPLIED_SQL, (job.get('title', ''), job.get('company', '')))
+            found = cursor.fetchone()
         
-        return count > 0
+        return found is not None
     
     def record_cv_upload(self, filename: str, ats_score: float) -> int:
         """Record a CV upload."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO cv_uploads (filename, ats_score)
-            VALUES (?, ?)
-        ''', (filename, ats_score))
-        
-        cv_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._write_lock, self._write_conn:
+            cursor = self._write_conn.cursor()
+            cursor.execute(INSERT_CV_UPLOAD_SQL, (filename, ats_score))
+            cv_id = cursor.lastrowid
         
         return cv_id
     
     def export_to_csv(self, filepath: str):
         """Export applications to CSV file."""
-        import csv
-        
-        applications = self.get_all_applications()
-        
-        if not applications:
-            return
-        
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = applications[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        with self._reader() as conn:
+            # Stream rows straight from the cursor rather than building
+            # the full list of dicts that get_all_applications returns
+            cursor = conn.cursor()
+            cursor.arraysize = 1000
+            cursor.execute(SELECT_ALL_APPLICATIONS_SQL)
+            rows = cursor.fetchmany()
+            
+            if not rows:
+                return
             
-            writer.writeheader()
-            for app in applications:
-                writer.writerow(app)
+            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                
+                writer.writerow([column[0] for column in cursor.description])
+                while rows:
+                    writer.writerows(rows)
+                    rows = cursor.fetchmany()
+    
+    def import_from_csv(self, filepath: str) -> int:
+        """Import applications from a CSV file written by export_to_csv."""
+        with open(filepath, newline='', encoding='utf-8') as csvfile:
+            rows = [
+                (
+                    row.get('job_id', ''),
+                    row.get('job_title', ''),
+                    row.get('company', ''),
+                    row.get('location', ''),
+                    row.get('salary_range') or None,
+                    float(row['match_score']) if row.get('match_score') else None,
+                    row.get('source', ''),
+                    row.get('job_url', ''),
+                    row.get('notes', ''),
+                    row.get('date_applied') or None,
+                    row.get('status') or None
+                )
+                for row in csv.DictReader(csvfile)
+            ]
+        
+        if not rows:
+            return 0
+        
+        with self._write_lock, self._write_conn:
+            # rowcount excludes rows skipped because their job_id already exists
+            imported = self._write_conn.executemany(self._import_application_sql, rows).rowcount
+        self._invalidate_stats()
+        
+        return imported
     
     def clear_all_applications(self):
         """Clear all applications from database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM applications')
-        
-        conn.commit()
-        conn.close()
+        with self._write_lock, self._write_conn:
+            self._write_conn.execute('DELETE FROM applications')
+        self._invalidate_stats()
 
 
 # Example usage
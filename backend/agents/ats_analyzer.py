@@ -4,75 +4,347 @@ Analyzes CV and provides an ATS compatibility score (0-100).
 """
 
 import re
-import os
 import json
-from typing import Dict, List
-import spacy
-from openai import OpenAI
+import asyncio
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+from agents.openai_client import get_async_client, get_client
+from agents.completion_cache import completion_cache
+from agents.term_matcher import build_term_matcher, lower_text
+
+try:
+    from numba import njit, prange
+except ImportError:  # Batch scoring falls back to plain NumPy
+    njit = None
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # Fall back to the stdlib parser
+    json_loads = json.loads
+
+
+# Score thresholds and the grade awarded at or above each one
+GRADE_THRESHOLDS = (60, 70, 80, 90)
+GRADES = ("Needs Improvement", "Fair", "Good", "Very Good", "Excellent")
+
+# Distinct action verbs / achievement matches needed for each score tier
+ACTION_VERB_THRESHOLDS = (2, 4, 7, 10)
+ACTION_VERB_SCORES = (3.0, 6.0, 9.0, 12.0, 15.0)
+ACHIEVEMENT_THRESHOLDS = (1, 3, 5, 8)
+ACHIEVEMENT_SCORES = (2.0, 6.0, 9.0, 12.0, 15.0)
+
+# Array forms of the tiers for the vectorized batch path
+ACTION_VERB_TIERS = (np.array(ACTION_VERB_THRESHOLDS), np.array(ACTION_VERB_SCORES))
+ACHIEVEMENT_TIERS = (np.array(ACHIEVEMENT_THRESHOLDS), np.array(ACHIEVEMENT_SCORES))
+
+# Characters that indicate tables/boxes in extracted text
+TABLE_CHARS = '|╣═║'
+
+# Action verbs commonly valued in CVs
+ACTION_VERBS = (
+    'achieved', 'improved', 'managed', 'led', 'developed', 'created',
+    'increased', 'decreased', 'implemented', 'launched', 'designed',
+    'built', 'established', 'streamlined', 'optimized', 'delivered',
+    'spearheaded', 'initiated', 'coordinated', 'executed', 'generated'
+)
+
+# Generic high-value keywords used when no job description is provided
+DEFAULT_KEYWORDS = (
+    'python', 'java', 'javascript', 'sql', 'aws', 'azure',
+    'machine learning', 'data analysis', 'project management',
+    'leadership', 'communication', 'problem solving'
+)
+
+# Precompiled patterns used on every analysis
+JSON_ARRAY_RE = re.compile(r'\[[\s\S]*\]')  # Outermost [...] in a model reply
+
+# Numbers/percentages that indicate achievements, fused into one alternation
+# so the CV text is walked once
+ACHIEVEMENT_RE = re.compile(
+    r'(\d+%'  # Percentages
+    r'|\$[\d,]+'  # Dollar amounts
+    r'|\d+\s*(?:million|thousand|billion)'  # Large numbers
+    r'|(?:increased|reduced|saved|grew)[^.\n]{0,40}?\d+)',  # Numerical improvements
+    re.IGNORECASE
+)
+
+
+def _tier_scores(verb_counts, achievement_counts, keywords_found, keyword_total):
+    """Map per-CV counts to (keywords, action_verbs, achievements) scores."""
+    n = verb_counts.shape[0]
+    scores = np.empty((n, 3))
+    for i in prange(n):
+        scores[i, 0] = min(((keywords_found[i] / keyword_total) * 100 / 100) * 25, 25.0)
+        
+        tier = 0
+        for threshold in ACTION_VERB_THRESHOLDS:
+            if verb_counts[i] >= threshold:
+                tier += 1
+        scores[i, 1] = ACTION_VERB_SCORES[tier]
+        
+        tier = 0
+        for threshold in ACHIEVEMENT_THRESHOLDS:
+            if achievement_counts[i] >= threshold:
+                tier += 1
+        scores[i, 2] = ACHIEVEMENT_SCORES[tier]
+    return scores
+
+
+if njit is not None:
+    _tier_scores = njit(parallel=True, cache=True)(_tier_scores)
+
+
+def _lookup_tiers(counts: np.ndarray, tiers: Tuple[np.ndarray, np.ndarray]) -> np.ndarray:
+    """Vectorized bisect_right: the score of the tier each count falls in."""
+    thresholds, scores = tiers
+    return scores[np.searchsorted(thresholds, counts, side='right')]
+
+
+class _JsonArrayScanner:
+    """
+    Track bracket depth over streamed model output to spot the end of the
+    top-level JSON array, so the rest of the stream can be dropped.
+    
+    Brackets inside JSON strings are ignored. If the output starts with an
+    object instead of an array the scanner gives up and never completes.
+    """
+    
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.active = True
+        self.parts = []
+    
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk of output; returns True once the array has closed."""
+        if not self.active:
+            return False
+        
+        start = 0 if self.depth else None
+        for i, char in enumerate(chunk):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif self.depth == 0:
+                if char == '[':
+                    start = i
+                    self.depth = 1
+                elif char == '{':
+                    self.active = False
+                    return False
+            elif char == '"':
+                self.in_string = True
+            elif char in '[{':
+                self.depth += 1
+            elif char in ']}':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.parts.append(chunk[start:i + 1])
+                    return True
+        
+        if start is not None:
+            self.parts.append(chunk[start:])
+        return False
+    
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+
+@lru_cache(maxsize=128)
+def _build_keyword_scanner(verbs: Tuple[str, ...],
+                           keywords: Tuple[str, ...]) -> Tuple[Tuple[str, ...], Callable[[str], Set[str]]]:
+    """
+    Specialize term scanning for one job's keywords.
+    
+    The keywords are lowercased and merged with the action verbs once, so
+    scoring many CVs against the same job only pays for the text scan.
+    
+    Returns:
+        The lowercased keywords and a matcher for the verbs plus keywords
+    """
+    lowered = tuple(keyword.lower() for keyword in keywords)
+    terms = dict.fromkeys(verbs)
+    terms.update(dict.fromkeys(lowered))
+    return lowered, build_term_matcher(tuple(terms))
+
+
+@lru_cache(maxsize=1)
+def _load_nlp():
+    """Load the spaCy model once per process, without the components we don't use."""
+    try:
+        import spacy
+        return spacy.load(
+            "en_core_web_sm",
+            disable=["tagger", "attribute_ruler", "parser", "ner", "lemmatizer"]
+        )
+    except:
+        print("Warning: spaCy model not found. Install with: python -m spacy download en_core_web_sm")
+        return None
 
 
 class ATSAnalyzer:
     """Analyzes CVs for ATS (Applicant Tracking System) compatibility."""
     
+    # (contact field, points) - 10 points total
+    CONTACT_RULES = (
+        ('email', 4),
+        ('phone', 3),
+        ('linkedin', 3),
+    )
+    
+    # (CV section, points, predicate on the section's value) - 15 points total
+    STRUCTURE_RULES = (
+        ('contact', 3, bool),
+        ('summary', 3, lambda summary: len(summary) > 50),
+        ('experience', 4, bool),
+        ('education', 3, bool),
+        ('skills', 2, bool),
+    )
+    
+    # Docs per spaCy batch when piping many CVs through the model
+    NLP_BATCH_SIZE = 50
+    
+    # Cap on in-flight OpenAI requests when analyzing CVs concurrently
+    MAX_CONCURRENT_REQUESTS = 8
+    
     def __init__(self):
-        # Load spaCy model for NLP analysis
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except:
-            print("Warning: spaCy model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
-        
         # Initialize OpenAI client for detailed recommendations
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        
-        # Action verbs commonly valued in CVs
-        self.action_verbs = [
-            'achieved', 'improved', 'managed', 'led', 'developed', 'created',
-            'increased', 'decreased', 'implemented', 'launched', 'designed',
-            'built', 'established', 'streamlined', 'optimized', 'delivered',
-            'spearheaded', 'initiated', 'coordinated', 'executed', 'generated'
-        ]
+        self.client = get_client()
+        self.async_client = get_async_client()
+        
+        self.action_verbs = ACTION_VERBS
+        self._action_verbs_hint = f"Use more action verbs like: {', '.join(self.action_verbs[:5])}"
+        self.default_keywords = DEFAULT_KEYWORDS
+        
+        # Single matcher over all fixed terms so one pass over the CV text
+        # finds every action verb and default keyword
+        self._verb_terms = ACTION_VERBS
+        self._find_terms = build_term_matcher(ACTION_VERBS + DEFAULT_KEYWORDS)
     
-    def analyze(self, cv_data: Dict, target_keywords: List[str] = None) -> Dict:
+    @property
+    def nlp(self):
+        """spaCy model for NLP analysis, loaded on first use and shared across instances."""
+        return _load_nlp()
+    
+    def process_texts(self, texts: List[str]) -> List:
+        """
+        Run many CV texts through spaCy in batches instead of one call per CV.
+        
+        Args:
+            texts: Raw CV texts
+            
+        Returns:
+            List of spaCy Docs in input order, or an empty list if the model is unavailable
+        """
+        if self.nlp is None:
+            return []
+        return list(self.nlp.pipe(texts, batch_size=self.NLP_BATCH_SIZE, n_process=1))
+    
+    def analyze(self, cv_data: Dict, target_keywords: List[str] = None, force_refresh: bool = False) -> Dict:
         """
         Analyze CV and return ATS score with breakdown.
         
         Args:
             cv_data: Parsed CV data from CVParser
             target_keywords: Optional list of keywords from job description
+            force_refresh: Ask OpenAI again even if these recommendations are cached
             
         Returns:
             Dict with score and detailed feedback
         """
+        scores = self._score_cv(cv_data, target_keywords)
+        detailed_recommendations = self._generate_detailed_recommendations(cv_data, scores, force_refresh)
+        return self._build_result(cv_data, scores, target_keywords, detailed_recommendations)
+    
+    async def analyze_async(self, cv_data: Dict, target_keywords: List[str] = None,
+                            force_refresh: bool = False) -> Dict:
+        """
+        Async version of analyze() that doesn't block the event loop on the OpenAI call.
+        
+        Args:
+            cv_data: Parsed CV data from CVParser
+            target_keywords: Optional list of keywords from job description
+            force_refresh: Ask OpenAI again even if these recommendations are cached
+            
+        Returns:
+            Dict with score and detailed feedback
+        """
+        scores = self._score_cv(cv_data, target_keywords)
+        detailed_recommendations = await self._generate_detailed_recommendations_async(cv_data, scores, force_refresh)
+        return self._build_result(cv_data, scores, target_keywords, detailed_recommendations)
+    
+    async def analyze_many_async(self, cv_list: List[Dict], target_keywords: List[str] = None,
+                                 force_refresh: bool = False) -> List[Dict]:
+        """
+        Fully analyze many CVs, running their OpenAI requests concurrently.
+        
+        At most MAX_CONCURRENT_REQUESTS requests are in flight at once to
+        stay within API rate limits.
+        
+        Args:
+            cv_list: Parsed CV data dicts from CVParser
+            target_keywords: Optional list of keywords from job description
+            force_refresh: Ask OpenAI again even if these recommendations are cached
+            
+        Returns:
+            List of analyze() results, in input order
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        async def analyze_one(cv_data: Dict) -> Dict:
+            async with semaphore:
+                return await self.analyze_async(cv_data, target_keywords, force_refresh)
+        
+        return await asyncio.gather(*(analyze_one(cv_data) for cv_data in cv_list))
+    
+    def _score_cv(self, cv_data: Dict, target_keywords: List[str] = None) -> Dict:
+        """Compute the per-category ATS scores for one CV."""
         scores = {}
         
+        # Lowercase the CV text once and share it across the text scorers
+        raw_text = cv_data.get('raw_text', '')
+        text_lower = lower_text(raw_text)
+        
         # 1. Contact Information (10 points)
         scores['contact'] = self._score_contact(cv_data.get('contact', {}))
         
         # 2. Formatting (20 points)
-        scores['formatting'] = self._score_formatting(cv_data.get('raw_text', ''))
+        scores['formatting'] = self._score_formatting(raw_text)
         
         # 3. Keywords (25 points)
-        scores['keywords'] = self._score_keywords(cv_data.get('raw_text', ''), target_keywords)
+        # One term scan finds the action verbs and the keywords together
+        keywords, found_terms = self._scan_terms(text_lower, target_keywords)
+        scores['keywords'] = self._score_keywords(found_terms, keywords)
         
         # 4. Action Verbs (15 points)
-        scores['action_verbs'] = self._score_action_verbs(cv_data.get('raw_text', ''))
+        scores['action_verbs'] = self._score_action_verbs(found_terms)
         
         # 5. Section Structure (15 points)
         scores['structure'] = self._score_structure(cv_data)
         
         # 6. Quantifiable Achievements (15 points)
-        scores['achievements'] = self._score_achievements(cv_data.get('raw_text', ''))
+        scores['achievements'] = self._score_achievements(text_lower)
         
+        return scores
+    
+    def _build_result(self, cv_data: Dict, scores: Dict, target_keywords: List[str],
+                      detailed_recommendations: List[Dict]) -> Dict:
+        """Assemble the analysis result from the scores and recommendations."""
         # Calculate total score
         total_score = sum(scores.values())
         
         # Generate feedback
         feedback = self._generate_feedback(scores, cv_data, target_keywords)
         
-        # Generate detailed recommendations
-        detailed_recommendations = self._generate_detailed_recommendations(cv_data, scores)
-        
         return {
             'total_score': round(total_score),
             'score_breakdown': scores,
@@ -82,16 +354,117 @@ class ATSAnalyzer:
             'grade': self._get_grade(total_score)
         }
     
+    def analyze_batch(self, cv_list: List[Dict], target_keywords: List[str] = None) -> List[Dict]:
+        """
+        Score many CVs at once (e.g. a recruiter's candidate pool).
+        
+        Term presence for every CV is collected into one sparse CV x term
+        matrix and the keyword/action-verb scores are computed as matrix
+        operations. Feedback and GPT recommendations are skipped.
+        
+        Args:
+            cv_list: Parsed CV data dicts from CVParser
+            target_keywords: Optional list of keywords from job description
+            
+        Returns:
+            List of dicts with total_score, score_breakdown and grade, one per CV
+        """
+        if not cv_list:
+            return []
+        
+        raw_texts = [cv_data.get('raw_text', '') for cv_data in cv_list]
+        texts_lower = [text.lower() for text in raw_texts]
+        
+        # Action verbs (and default keywords) via the shared term scanner
+        terms = list(dict.fromkeys(self.action_verbs + self.default_keywords))
+        term_matrix = CountVectorizer(
+            vocabulary=terms, analyzer=self._find_terms, binary=True, dtype=np.int8
+        ).fit_transform(texts_lower)
+        is_verb = np.array([term in self.action_verbs for term in terms], dtype=np.int64)
+        verb_counts = term_matrix @ is_verb
+        
+        # Keywords: duplicate entries in target_keywords count once per entry,
+        # as in _score_keywords, so weight each distinct keyword by its multiplicity
+        if not target_keywords:
+            keyword_weights = np.array([term in self.default_keywords for term in terms], dtype=np.int64)
+            keywords_found = term_matrix @ keyword_weights
+            keyword_total = len(self.default_keywords)
+        else:
+            keywords_found = self._count_keywords_batch(texts_lower, target_keywords)
+            keyword_total = len(target_keywords)
+        
+        achievement_counts = np.array(
+            [len(ACHIEVEMENT_RE.findall(text)) for text in texts_lower], dtype=np.int64
+        )
+        
+        if njit is not None:
+            tier_scores = _tier_scores(verb_counts, achievement_counts, keywords_found, keyword_total)
+            keyword_scores, verb_scores, achievement_scores = tier_scores.T
+        else:
+            keyword_scores = np.minimum(((keywords_found / keyword_total) * 100 / 100) * 25, 25.0)
+            verb_scores = _lookup_tiers(verb_counts, ACTION_VERB_TIERS)
+            achievement_scores = _lookup_tiers(achievement_counts, ACHIEVEMENT_TIERS)
+        
+        results = []
+        for i, cv_data in enumerate(cv_list):
+            scores = {
+                'contact': self._score_contact(cv_data.get('contact', {})),
+                'formatting': self._score_formatting(raw_texts[i]),
+                'keywords': float(keyword_scores[i]),
+                'action_verbs': float(verb_scores[i]),
+                'structure': self._score_structure(cv_data),
+                'achievements': float(achievement_scores[i])
+            }
+            total_score = sum(scores.values())
+            results.append({
+                'total_score': round(total_score),
+                'score_breakdown': scores,
+                'grade': self._get_grade(total_score)
+            })
+        
+        return results
+    
+    def score_keywords_batch(self, texts_lower: List[str], keywords: List[str] = None) -> np.ndarray:
+        """
+        Keyword scores (out of 25) for many CVs against the same keyword list.
+        
+        Args:
+            texts_lower: Lowercased CV texts
+            keywords: Keywords from the job description; defaults to the generic keywords
+            
+        Returns:
+            Array with one keyword score per text, matching _score_keywords
+        """
+        if not keywords:
+            keywords = self.default_keywords
+        
+        keywords_found = self._count_keywords_batch(texts_lower, keywords)
+        return np.minimum(((keywords_found / len(keywords)) * 100 / 100) * 25, 25.0)
+    
+    def _count_keywords_batch(self, texts_lower: List[str], keywords: List[str]) -> np.ndarray:
+        """
+        Count the keywords present in each text.
+        
+        A CV x keyword presence matrix is filled from one Aho-Corasick scan per
+        text; duplicate entries in keywords count once per entry, as in
+        _score_keywords, so each distinct keyword is weighted by its multiplicity.
+        """
+        lowered = [keyword.lower() for keyword in keywords]
+        distinct = list(dict.fromkeys(lowered))
+        column = {keyword: j for j, keyword in enumerate(distinct)}
+        find_keywords = build_term_matcher(tuple(distinct))
+        
+        present = np.zeros((len(texts_lower), len(distinct)), dtype=bool)
+        for i, text in enumerate(texts_lower):
+            for keyword in find_keywords(text):
+                present[i, column[keyword]] = True
+        
+        weights = np.array([lowered.count(keyword) for keyword in distinct], dtype=np.int64)
+        return present @ weights
+    
     def _score_contact(self, contact: Dict) -> float:
         """Score: 10 points for complete contact information."""
-        score = 0
-        if contact.get('email'):
-            score += 4
-        if contact.get('phone'):
-            score += 3
-        if contact.get('linkedin'):
-            score += 3
-        return score
+        return sum(points for field, points in self.CONTACT_RULES if contact.get(field))
     
     def _score_formatting(self, text: str) -> float:
         """Score: 20 points for ATS-friendly formatting."""
@@ -102,28 +475,33 @@ class ATSAnalyzer:
             score -=  5
         
         # Check for problematic elements
-        if re.search(r'[\|\╣\═\║]', text):  # Table characters
+        if any(char in text for char in TABLE_CHARS):  # Table characters
             score -= 8
         
-        # Check for reasonable line breaks
-        lines = text.split('\n')
-        if len(lines) < 20:  # Too few lines = might be in columns/tables
+        # Check for reasonable line breaks (count them without splitting the text)
+        line_count = text.count('\n') + 1
+        if line_count < 20:  # Too few lines = might be in columns/tables
             score -= 4
         
         return max(0, score)
     
-    def _score_keywords(self, text: str, target_keywords: List[str] = None) -> float:
-        """Score: 25 points for keyword presence."""
+    def _scan_terms(self, text_lower: str, target_keywords: List[str] = None) -> Tuple[Sequence[str], Set[str]]:
+        """
+        Find every action verb and keyword present in lowercased text in one pass.
+        
+        Returns:
+            The lowercased keywords to score against, and the set of terms found
+        """
         if not target_keywords:
             # Use generic high-value keywords if no job description provided
-            target_keywords = [
-                'python', 'java', 'javascript', 'sql', 'aws', 'azure',
-                'machine learning', 'data analysis', 'project management',
-                'leadership', 'communication', 'problem solving'
-            ]
+            return self.default_keywords, self._find_terms(text_lower)
         
-        text_lower = text.lower()
-        found_keywords = sum(1 for keyword in target_keywords if keyword.lower() in text_lower)
+        keywords, find_terms = _build_keyword_scanner(self._verb_terms, tuple(target_keywords))
+        return keywords, find_terms(text_lower)
+    
+    def _score_keywords(self, found_terms: Set[str], target_keywords: Sequence[str]) -> float:
+        """Score: 25 points for keyword presence, given _scan_terms' lowercased keywords and found terms."""
+        found_keywords = sum(1 for keyword in target_keywords if keyword in found_terms)
         
         if len(target_keywords) == 0:
             return 25.0
@@ -133,72 +511,29 @@ class ATSAnalyzer:
         
         return min(score, 25.0)
     
-    def _score_action_verbs(self, text: str) -> float:
-        """Score: 15 points for use of strong action verbs."""
-        text_lower = text.lower()
-        verb_count = sum(1 for verb in self.action_verbs if verb in text_lower)
+    def _score_action_verbs(self, found_terms: Set[str]) -> float:
+        """Score: 15 points for use of strong action verbs, given the terms found by _scan_terms."""
+        verb_count = sum(1 for verb in self.action_verbs if verb in found_terms)
         
         # Score based on frequency
-        if verb_count >= 10:
-            return 15.0
-        elif verb_count >= 7:
-            return 12.0
-        elif verb_count >= 4:
-            return 9.0
-        elif verb_count >= 2:
-            return 6.0
-        else:
-            return 3.0
+        return ACTION_VERB_SCORES[bisect_right(ACTION_VERB_THRESHOLDS, verb_count)]
     
     def _score_structure(self, cv_data: Dict) -> float:
         """Score: 15 points for proper CV structure."""
-        score = 0
-        
         # Check for key sections
-        if cv_data.get('contact'):
-            score += 3
-        if cv_data.get('summary') and len(cv_data['summary']) > 50:
-            score += 3
-        if cv_data.get('experience') and len(cv_data['experience']) > 0:
-            score += 4
-        if cv_data.get('education') and len(cv_data['education']) > 0:
-            score += 3
-        if cv_data.get('skills') and len(cv_data['skills']) > 0:
-            score += 2
-        
+        score = 0
+        for section, points, predicate in self.STRUCTURE_RULES:
+            value = cv_data.get(section)
+            if value and predicate(value):
+                score += points
         return score
     
-    def _score_achievements(self, text: str) -> float:
-        """Score: 15 points for quantifiable achievements."""
-        # Look for numbers/percentages that indicate achievements
-        achievement_patterns = [
-            r'\d+%',  # Percentages
-            r'\$[\d,]+',  # Dollar amounts
-            r'\d+\s*(million|thousand|billion)',  # Large numbers
-            r'increased.*\d+',  # Numerical improvements
-            r'reduced.*\d+',
-            r'saved.*\d+',
-            r'grew.*\d+'
-        ]
-        
-        text_lower = text.lower()
-        achievement_count = 0
-        
-        for pattern in achievement_patterns:
-            matches = re.findall(pattern, text_lower)
-            achievement_count += len(matches)
+    def _score_achievements(self, text_lower: str) -> float:
+        """Score: 15 points for quantifiable achievements (expects lowercased text)."""
+        achievement_count = len(ACHIEVEMENT_RE.findall(text_lower))
         
         # Score based on quantifiable achievements found
-        if achievement_count >= 8:
-            return 15.0
-        elif achievement_count >= 5:
-            return 12.0
-        elif achievement_count >= 3:
-            return 9.0
-        elif achievement_count >= 1:
-            return 6.0
-        else:
-            return 2.0
+        return ACHIEVEMENT_SCORES[bisect_right(ACHIEVEMENT_THRESHOLDS, achievement_count)]
     
     def _generate_feedback(self, scores: Dict, cv_data: Dict, target_keywords: List[str]) -> Dict:
         """Generate detailed feedback based on scores."""
@@ -227,7 +562,7 @@ class ATSAnalyzer:
         if scores['action_verbs'] >= 10:
             strengths.append("Good use of action verbs")
         else:
-            improvements.append(f"Use more action verbs like: {', '.join(self.action_verbs[:5])}")
+            improvements.append(self._action_verbs_hint)
         
         # Structure feedback
         if scores['structure'] >= 12:
@@ -254,18 +589,88 @@ class ATSAnalyzer:
             'improvements': improvements
         }
     
-    def _generate_detailed_recommendations(self, cv_data: Dict, scores: Dict) -> List[Dict]:
+    def _generate_detailed_recommendations(self, cv_data: Dict, scores: Dict,
+                                           force_refresh: bool = False) -> List[Dict]:
         """Generate detailed, actionable recommendations with specific text replacements."""
         try:
-            # Build context for OpenAI
-            cv_sections = {
-                'summary': cv_data.get('summary', ''),
-                'experience': '\n'.join(cv_data.get('experience', [])),
-                'education': '\n'.join(cv_data.get('education', [])),
-                'skills': ', '.join(cv_data.get('skills', []))
-            }
+            request = self._recommendations_request(cv_data, scores)
+            cache_key = completion_cache.key(request)
+            content = None if force_refresh else completion_cache.get(cache_key)
+            if content is None:
+                with self.client.chat.completions.create(**request, stream=True) as stream:
+                    content = self._read_recommendations_stream(stream)
+            
+            # Only cache responses that parse, so a malformed reply is retried next time
+            recommendations = self._parse_recommendations(content)
+            completion_cache.set(cache_key, content)
+            return recommendations
+        
+        except Exception as e:
+            print(f"Error generating detailed recommendations: {str(e)}")
+            return self._fallback_recommendations()
+    
+    async def _generate_detailed_recommendations_async(self, cv_data: Dict, scores: Dict,
+                                                       force_refresh: bool = False) -> List[Dict]:
+        """Async version of _generate_detailed_recommendations()."""
+        try:
+            request = self._recommendations_request(cv_data, scores)
+            cache_key = completion_cache.key(request)
+            content = None if force_refresh else completion_cache.get(cache_key)
+            if content is None:
+                stream = await self.async_client.chat.completions.create(**request, stream=True)
+                async with stream:
+                    content = await self._read_recommendations_stream_async(stream)
             
-            prompt = f"""Analyze this CV and provide 3-5 specific, actionable text improvement recommendations.
+            recommendations = self._parse_recommendations(content)
+            completion_cache.set(cache_key, content)
+            return recommendations
+        
+        except Exception as e:
+            print(f"Error generating detailed recommendations: {str(e)}")
+            return self._fallback_recommendations()
+    
+    def _read_recommendations_stream(self, stream) -> str:
+        """
+        Collect streamed recommendations, stopping as soon as the JSON array closes.
+        
+        Returns:
+            The JSON array text, or everything received if no complete array was seen
+        """
+        scanner = _JsonArrayScanner()
+        received = []
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            received.append(delta)
+            if scanner.feed(delta):
+                return scanner.text
+        return ''.join(received)
+    
+    async def _read_recommendations_stream_async(self, stream) -> str:
+        """Async version of _read_recommendations_stream()."""
+        scanner = _JsonArrayScanner()
+        received = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            received.append(delta)
+            if scanner.feed(delta):
+                return scanner.text
+        return ''.join(received)
+    
+    def _recommendations_request(self, cv_data: Dict, scores: Dict) -> Dict:
+        """Build the chat completion arguments for the recommendations request."""
+        # Build context for OpenAI
+        cv_sections = {
+            'summary': cv_data.get('summary', ''),
+            'experience': '\n'.join(cv_data.get('experience', [])),
+            'education': '\n'.join(cv_data.get('education', [])),
+            'skills': ', '.join(cv_data.get('skills', []))
+        }
+        
+        prompt = f"""Analyze this CV and provide 3-5 specific, actionable text improvement recommendations.
 
 CV Content:
 Summary: {cv_sections['summary']}
@@ -300,57 +705,48 @@ Focus on:
 - Including quantifiable metrics
 - Improving keyword density
 - Making achievements more impactful"""
-
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert CV coach and ATS optimization specialist. Provide specific, actionable feedback."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            # Parse JSON response
-            recommendations_text = response.choices[0].message.content.strip()
-            # Remove markdown code blocks if present
-            recommendations_text = re.sub(r'```json\n?', '', recommendations_text)
-            recommendations_text = re.sub(r'```\n?', '', recommendations_text)
-            
-            recommendations = json.loads(recommendations_text)
-            
-            # Ensure we have valid recommendations
-            if not isinstance(recommendations, list):
-                return []
-            
-            # Limit to top 5 recommendations
-            return recommendations[:5]
-            
-        except Exception as e:
-            print(f"Error generating detailed recommendations: {str(e)}")
-            # Return fallback recommendations
-            return [
-                {
-                    "section": "Summary",
-                    "current_text": "Review your professional summary",
-                    "recommended_text": "Add 2-3 sentences highlighting your top achievements and skills",
-                    "reason": "A strong summary improves ATS ranking and recruiter engagement",
-                    "priority": "high"
-                }
-            ]
+        
+        return {
+            'model': "gpt-4o-mini",
+            'messages': [
+                {"role": "system", "content": "You are an expert CV coach and ATS optimization specialist. Provide specific, actionable feedback."},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 1500
+        }
+    
+    def _parse_recommendations(self, content: str) -> List[Dict]:
+        """Parse the JSON recommendations array returned by the model."""
+        # Pull the array out of any markdown fences or surrounding prose
+        match = JSON_ARRAY_RE.search(content)
+        if not match:
+            raise ValueError("No JSON array in recommendations response")
+        
+        recommendations = json_loads(match.group(0))
+        
+        # Ensure we have valid recommendations
+        if not isinstance(recommendations, list):
+            return []
+        
+        # Limit to top 5 recommendations
+        return recommendations[:5]
+    
+    def _fallback_recommendations(self) -> List[Dict]:
+        """Static recommendations used when the OpenAI request fails."""
+        return [
+            {
+                "section": "Summary",
+                "current_text": "Review your professional summary",
+                "recommended_text": "Add 2-3 sentences highlighting your top achievements and skills",
+                "reason": "A strong summary improves ATS ranking and recruiter engagement",
+                "priority": "high"
+            }
+        ]
     
     def _get_grade(self, score: float) -> str:
         """Convert numerical score to letter grade."""
-        if score >= 90:
-            return "Excellent"
-        elif score >= 80:
-            return "Very Good"
-        elif score >= 70:
-            return "Good"
-        elif score >= 60:
-            return "Fair"
-        else:
-            return "Needs Improvement"
+        return GRADES[bisect_right(GRADE_THRESHOLDS, score)]
 
 
 # Example usage
@@ -0,0 +1,83 @@
+"""
+OpenAI completion cache shared by the agents that call GPT.
+Reuses responses for identical requests so re-analyzing the same CV or
+regenerating the same cover letter costs no API call.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+class CompletionCache:
+    """LRU cache of completion text keyed on a hash of the full request."""
+    
+    def __init__(self, max_entries: int = 1024, directory: Optional[str] = None):
+        """
+        Args:
+            max_entries: Number of responses kept in memory
+            directory: Optional directory for a persistent diskcache store
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self._disk = None
+        if directory and diskcache is not None:
+            self._disk = diskcache.Cache(directory)
+        elif directory:
+            print("Warning: diskcache not installed, caching OpenAI responses in memory only")
+    
+    @staticmethod
+    def key(request: Dict) -> str:
+        """Hash the model, sampling settings and messages of a completion request."""
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion text for key, or None on a miss."""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                return content
+        
+        if self._disk is not None:
+            content = self._disk.get(key)
+            if content is not None:
+                self._remember(key, content)
+        return content
+    
+    def set(self, key: str, content: str):
+        """Store completion text for key."""
+        self._remember(key, content)
+        if self._disk is not None:
+            self._disk.set(key, content)
+    
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._entries.clear()
+        if self._disk is not None:
+            self._disk.clear()
+    
+    def _remember(self, key: str, content: str):
+        """Insert into the in-memory LRU, evicting the oldest entry when full."""
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every agent instance in the process; set OPENAI_CACHE_DIR to
+# also persist responses across restarts
+completion_cache = CompletionCache(directory=os.getenv('OPENAI_CACHE_DIR'))
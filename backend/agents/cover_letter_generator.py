@@ -3,23 +3,103 @@ Agent 7: Cover Letter Generator
 Generates personalized cover letters using OpenAI GPT-4.
 """
 
-from openai import OpenAI
-import os
-from typing import Dict
+from agents.openai_client import get_async_client, get_client
+from agents.completion_cache import completion_cache
+import asyncio
+import re
+import string
+from functools import lru_cache
+from typing import Dict, List
 from dotenv import load_dotenv
 
+try:
+    import tiktoken
+except ImportError:  # Truncate by characters instead
+    tiktoken = None
+
 load_dotenv()
 
 
+# Token budgets for the free-text parts of the prompt; the character
+# fallback assumes ~4 characters per token
+JOB_DESCRIPTION_TOKENS = 125
+EXPERIENCE_TOKENS = 75
+CHARS_PER_TOKEN = 4
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Tone-specific instructions
+TONE_INSTRUCTIONS = {
+    'professional': 'Use a formal, professional tone. Be concise and business-like.',
+    'creative': 'Use a warm, engaging tone. Show personality while remaining professional.',
+    'technical': 'Use precise technical language. Focus on specific skills and technologies.'
+}
+
+PROMPT_TEMPLATE = string.Template("""Write a compelling cover letter for a job application.
+
+Job Details:
+- Position: $job_title
+- Company: $company
+- Job Description: $job_description
+
+Candidate Information:
+- Skills: $skills
+- Recent Experience: $experience_summary
+- Education: $education_str
+
+Instructions:
+- $tone_instruction
+- Length: 250-350 words
+- Structure: Opening paragraph (express interest), body paragraph (highlight relevant skills and experience with specific examples), closing paragraph (call to action)
+- Personalize to $company and $job_title
+- Mention specific skills from the job description that match the candidate's background
+- Do NOT include placeholder text like "[Your Name]" or "[Date]"
+- Do NOT include address blocks or formal letter formatting
+- Start directly with the content
+
+Cover Letter:""")
+
+
+@lru_cache(maxsize=8)
+def _load_encoding(model: str):
+    """Tokenizer for model, or None if tiktoken or its encoding data is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        print(f"Warning: tiktoken encoding unavailable, truncating prompts by characters: {e}")
+        return None
+
+
+def _truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Collapse runs of whitespace and cut text to at most max_tokens tokens."""
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    
+    encoding = _load_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
 class CoverLetterGenerator:
     """Generates tailored cover letters for job applications using AI."""
     
+    # Cap on in-flight OpenAI requests when generating letters concurrently
+    MAX_CONCURRENT_REQUESTS = 8
+    
     def __init__(self):
         """Initialize the cover letter generator with OpenAI."""
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.client = get_client()
+        self.async_client = get_async_client()
         self.model = "gpt-4o-mini"  # Using gpt-4o-mini for faster, cost-effective generation  # or "gpt-3.5-turbo" for faster/cheaper
+        self._encoding_loaded = False
     
-    def generate(self, cv_data: Dict, job: Dict, tone: str = "professional") -> Dict:
+    def generate(self, cv_data: Dict, job: Dict, tone: str = "professional", force_refresh: bool = False) -> Dict:
         """
         Generate a personalized cover letter.
         
@@ -27,91 +107,161 @@ class CoverLetterGenerator:
             cv_data: Parsed CV data
             job: Job dictionary
             tone: Tone style ('professional', 'creative', 'technical')
+            force_refresh: Ask OpenAI again even if this letter is cached
             
         Returns:
             Dict with cover letter text and metadata
         """
-        # Construct prompt
-        prompt = self._build_prompt(cv_data, job, tone)
+        try:
+            request = self._completion_request(cv_data, job, tone)
+            cache_key = completion_cache.key(request)
+            
+            content = None if force_refresh else completion_cache.get(cache_key)
+            if content is None:
+                # Call OpenAI API
+                response = self.client.chat.completions.create(**request)
+                content = response.choices[0].message.content
+                completion_cache.set(cache_key, content)
+            
+            return self._build_result(content, job, tone)
+        
+        except Exception as e:
+            print(f"Error generating cover letter: {e}")
+            return self._build_error_result(e, cv_data, job)
+    
+    async def generate_async(self, cv_data: Dict, job: Dict, tone: str = "professional",
+                             force_refresh: bool = False) -> Dict:
+        """
+        Async version of generate() that doesn't block the event loop on the OpenAI call.
+        
+        Args:
+            cv_data: Parsed CV data
+            job: Job dictionary
+            tone: Tone style ('professional', 'creative', 'technical')
+            force_refresh: Ask OpenAI again even if this letter is cached
+            
+        Returns:
+            Dict with cover letter text and metadata
+        """
+        await self._load_encoding_async()
         
         try:
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert career advisor and professional cover letter writer."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=600
-            )
+            request = self._completion_request(cv_data, job, tone)
+            cache_key = completion_cache.key(request)
             
-            cover_letter_text = response.choices[0].message.content.strip()
+            content = None if force_refresh else completion_cache.get(cache_key)
+            if content is None:
+                response = await self.async_client.chat.completions.create(**request)
+                content = response.choices[0].message.content
+                completion_cache.set(cache_key, content)
             
-            return {
-                'success': True,
-                'cover_letter': cover_letter_text,
-                'word_count': len(cover_letter_text.split()),
-                'tone': tone,
-                'job_title': job.get('title', ''),
-                'company': job.get('company', '')
-            }
+            return self._build_result(content, job, tone)
         
         except Exception as e:
             print(f"Error generating cover letter: {e}")
-            return {
-                'success': False,
-                'error': str(e),
-                'cover_letter': self._generate_fallback_letter(cv_data, job)
-            }
+            return self._build_error_result(e, cv_data, job)
+    
+    async def generate_many_async(self, cv_data: Dict, jobs: List[Dict], tone: str = "professional",
+                                  force_refresh: bool = False) -> List[Dict]:
+        """
+        Generate cover letters for several jobs concurrently.
+        
+        At most MAX_CONCURRENT_REQUESTS requests are in flight at once to
+        stay within API rate limits.
+        
+        Args:
+            cv_data: Parsed CV data
+            jobs: Job dictionaries to write letters for
+            tone: Tone style ('professional', 'creative', 'technical')
+            force_refresh: Ask OpenAI again even if this letter is cached
+            
+        Returns:
+            List of generate() results, in the same order as jobs
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        async def generate_one(job: Dict) -> Dict:
+            async with semaphore:
+                return await self.generate_async(cv_data, job, tone, force_refresh)
+        
+        return await asyncio.gather(*(generate_one(job) for job in jobs))
+    
+    async def _load_encoding_async(self):
+        """
+        Load the prompt tokenizer in a worker thread on first use.
+        
+        tiktoken may download its BPE file the first time, which would
+        otherwise stall the event loop; failures fall back to character
+        truncation.
+        """
+        if not self._encoding_loaded:
+            await asyncio.to_thread(_load_encoding, self.model)
+            self._encoding_loaded = True
+    
+    def _completion_request(self, cv_data: Dict, job: Dict, tone: str) -> Dict:
+        """Build the chat completion arguments for a cover letter."""
+        # Construct prompt
+        prompt = self._build_prompt(cv_data, job, tone)
+        
+        return {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": "You are an expert career advisor and professional cover letter writer."},
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': 0.7,
+            'max_tokens': 600
+        }
+    
+    def _build_result(self, content: str, job: Dict, tone: str) -> Dict:
+        """Wrap generated cover letter text with its metadata."""
+        cover_letter_text = content.strip()
+        
+        return {
+            'success': True,
+            'cover_letter': cover_letter_text,
+            'word_count': len(cover_letter_text.split()),
+            'tone': tone,
+            'job_title': job.get('title', ''),
+            'company': job.get('company', '')
+        }
+    
+    def _build_error_result(self, error: Exception, cv_data: Dict, job: Dict) -> Dict:
+        """Result returned when the API call fails, carrying a fallback letter."""
+        return {
+            'success': False,
+            'error': str(error),
+            'cover_letter': self._generate_fallback_letter(cv_data, job)
+        }
     
     def _build_prompt(self, cv_data: Dict, job: Dict, tone: str) -> str:
         """Build the prompt for GPT-4."""
         # Extract key info from CV
         skills = ', '.join(cv_data.get('skills', [])[:10])
-        experience_summary = ' '.join(cv_data.get('experience', [])[:2])[:300]
+        experience_summary = _truncate_to_tokens(
+            ' '.join(cv_data.get('experience', [])[:2]), EXPERIENCE_TOKENS, self.model
+        )
         education = cv_data.get('education', [])
         education_str = education[0] if education else "relevant education"
         
         # Extract job info
         job_title = job.get('title', 'this position')
         company = job.get('company', 'your company')
-        job_description = job.get('description', '')[:500]
+        job_description = _truncate_to_tokens(
+            job.get('description', ''), JOB_DESCRIPTION_TOKENS, self.model
+        )
         
-        # Tone-specific instructions
-        tone_instructions = {
-            'professional': 'Use a formal, professional tone. Be concise and business-like.',
-            'creative': 'Use a warm, engaging tone. Show personality while remaining professional.',
-            'technical': 'Use precise technical language. Focus on specific skills and technologies.'
-        }
-        
-        tone_instruction = tone_instructions.get(tone, tone_instructions['professional'])
-        
-        prompt = f"""Write a compelling cover letter for a job application.
-
-Job Details:
-- Position: {job_title}
-- Company: {company}
-- Job Description: {job_description}
-
-Candidate Information:
-- Skills: {skills}
-- Recent Experience: {experience_summary}
-- Education: {education_str}
-
-Instructions:
-- {tone_instruction}
-- Length: 250-350 words
-- Structure: Opening paragraph (express interest), body paragraph (highlight relevant skills and experience with specific examples), closing paragraph (call to action)
-- Personalize to {company} and {job_title}
-- Mention specific skills from the job description that match the candidate's background
-- Do NOT include placeholder text like "[Your Name]" or "[Date]"
-- Do NOT include address blocks or formal letter formatting
-- Start directly with the content
-
-Cover Letter:"""
+        tone_instruction = TONE_INSTRUCTIONS.get(tone, TONE_INSTRUCTIONS['professional'])
         
-        return prompt
+        return PROMPT_TEMPLATE.substitute(
+            job_title=job_title,
+            company=company,
+            job_description=job_description,
+            skills=skills,
+            experience_summary=experience_summary,
+            education_str=education_str,
+            tone_instruction=tone_instruction
+        )
     
     def _generate_fallback_letter(self, cv_data: Dict, job: Dict) -> str:
         """Generate a basic cover letter if API fails."""
@@ -6,43 +6,111 @@ Extracts structured data from PDF and DOCX files.
 import PyPDF2
 from docx import Document
 import re
-from typing import Dict, List, Optional
+import sys
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+
+# Precompiled patterns shared by every parse
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE_RE = re.compile(r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}')
+LINKEDIN_RE = re.compile(r'linkedin\.com/in/[\w-]+', re.IGNORECASE)
+# Byte versions of the contact patterns; on ASCII-only text they match exactly
+# what the str patterns do but scan faster
+CONTACT_BYTES_RES = (
+    ('email', re.compile(EMAIL_RE.pattern.encode('ascii'))),
+    ('phone', re.compile(PHONE_RE.pattern.encode('ascii'))),
+    ('linkedin', re.compile(LINKEDIN_RE.pattern.encode('ascii'), re.IGNORECASE)),
+)
+YEAR_RE = re.compile(r'\d{4}')
+EDUCATION_RE = re.compile(r'\b(university|college|bachelor|master|phd|degree)\b', re.IGNORECASE)
+SKILL_DELIMITER_RE = re.compile(r'[,•|]')
+
+# Section headers mapped to the bucket their lines belong to; sections we
+# don't extract still need an entry so they end the previous section
+SECTION_MAP = {
+    'summary': 'summary',
+    'professional summary': 'summary',
+    'objective': 'summary',
+    'profile': 'summary',
+    'experience': 'experience',
+    'professional experience': 'experience',
+    'work experience': 'experience',
+    'work history': 'experience',
+    'employment': 'experience',
+    'education': 'education',
+    'academic': 'education',
+    'qualifications': 'education',
+    'skills': 'skills',
+    'technical skills': 'skills',
+    'core competencies': 'skills',
+    'expertise': 'skills',
+    'certifications': 'certifications',
+    'references': 'references',
+}
+
+# A whole line holding just a section header (optionally followed by a colon)
+SECTION_HEADER_RE = re.compile(
+    r'^[^\S\n]*(' + '|'.join(sorted(map(re.escape, SECTION_MAP), key=len, reverse=True)) + r')[^\S\n]*:?[^\S\n]*$',
+    re.MULTILINE | re.IGNORECASE
+)
+# Non-blank lines, without their surrounding whitespace
+CONTENT_LINE_RE = re.compile(r'^[^\S\n]*(\S(?:.*\S)?)', re.MULTILINE)
 
 
 class CVParser:
     """Parses CV files (PDF/DOCX) and extracts structured information."""
     
-    def __init__(self):
-        self.sections = {
-            'contact': [],
-            'summary': [],
-            'experience': [],
-            'education': [],
-            'skills': [],
-            'certifications': []
-        }
-    
     def parse_pdf(self, file_path: str) -> Dict:
         """Extract text from PDF file."""
-        text = ""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text()
-        except Exception as e:
-            print(f"Error parsing PDF: {e}")
-            return {}
+        text = None
+        if pdfium is not None:
+            try:
+                text = self._extract_pdf_text_pdfium(file_path)
+            except Exception as e:
+                print(f"Error parsing PDF with pypdfium2, falling back to PyPDF2: {e}")
+        
+        if text is None:
+            try:
+                with open(file_path, 'rb') as file:
+                    pdf_reader = PyPDF2.PdfReader(file)
+                    text = "".join(page.extract_text() or "" for page in pdf_reader.pages)
+            except Exception as e:
+                print(f"Error parsing PDF: {e}")
+                return {}
         
         return self.extract_sections(text)
     
+    def _extract_pdf_text_pdfium(self, file_path: str) -> str:
+        """
+        Extract PDF text with PDFium's C text layer.
+        
+        Pages are read one after another: PDFium is not thread-safe, so
+        a single document can't be shared across worker threads.
+        """
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            pages = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        
+        # PDFium separates lines with CRLF; the section parser splits on LF
+        return "\n".join(pages).replace("\r\n", "\n")
+    
     def parse_docx(self, file_path: str) -> Dict:
         """Extract text from DOCX file."""
-        text = ""
         try:
             doc = Document(file_path)
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            text = "".join(f"{paragraph.text}\n" for paragraph in doc.paragraphs)
         except Exception as e:
             print(f"Error parsing DOCX: {e}")
             return {}
@@ -51,151 +119,109 @@ class CVParser:
     
     def extract_sections(self, text: str) -> Dict:
         """Extract different sections from CV text."""
+        sections = self._segment_sections(text)
         cv_data = {
             'raw_text': text,
             'contact': self._extract_contact(text),
-            'summary': self._extract_summary(text),
-            'experience': self._extract_experience(text),
-            'education': self._extract_education(text),
-            'skills': self._extract_skills(text),
+            'summary': self._extract_summary(sections['summary']),
+            'experience': self._extract_experience(sections['experience']),
+            'education': self._extract_education(sections['education']),
+            'skills': self._extract_skills(sections['skills']),
             'total_word_count': len(text.split())
         }
         return cv_data
     
+    def _segment_sections(self, text: str) -> Dict[str, List[str]]:
+        """
+        Split CV text into per-section line buckets.
+        
+        Header lines are located with one SECTION_HEADER_RE scan and the
+        text between consecutive headers becomes that section's content.
+        Text before the first header is left out of every bucket.
+        """
+        buckets = {section: [] for section in set(SECTION_MAP.values())}
+        headers = list(SECTION_HEADER_RE.finditer(text))
+        
+        for i, header in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+            section = SECTION_MAP[header.group(1).lower()]
+            buckets[section].extend(CONTENT_LINE_RE.findall(text, header.end(), end))
+        
+        return buckets
+    
     def _extract_contact(self, text: str) -> Dict:
         """Extract contact information."""
+        # Most CVs are plain ASCII; scan those as bytes and decode the matches
+        if text.isascii():
+            text_bytes = text.encode('ascii')
+            contact = {}
+            for field, pattern in CONTACT_BYTES_RES:
+                match = pattern.search(text_bytes)
+                contact[field] = match.group(0).decode('ascii') if match else None
+            return contact
+        
         contact = {}
         
         # Email
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        email_match = re.search(email_pattern, text)
+        email_match = EMAIL_RE.search(text)
         contact['email'] = email_match.group(0) if email_match else None
         
         # Phone
-        phone_pattern = r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-        phone_match = re.search(phone_pattern, text)
+        phone_match = PHONE_RE.search(text)
         contact['phone'] = phone_match.group(0) if phone_match else None
         
         # LinkedIn
-        linkedin_pattern = r'linkedin\.com/in/[\w-]+'
-        linkedin_match = re.search(linkedin_pattern, text, re.IGNORECASE)
+        linkedin_match = LINKEDIN_RE.search(text)
         contact['linkedin'] = linkedin_match.group(0) if linkedin_match else None
         
         return contact
     
-    def _extract_summary(self, text: str) -> str:
+    def _extract_summary(self, lines: List[str]) -> str:
         """Extract professional summary/objective."""
-        summary_keywords = ['summary', 'objective', 'profile', 'professional summary']
-        lines = text.split('\n')
-        
-        summary_text = ""
-        capturing = False
-        
-        for i, line in enumerate(lines):
-            lower_line = line.lower().strip()
-            
-            # Start capturing after finding summary keyword
-            if any(keyword in lower_line for keyword in summary_keywords):
-                capturing = True
-                continue
-            
-            # Stop at next section
-            if capturing:
-                if any(keyword in lower_line for keyword in ['experience', 'education', 'skills', 'work history']):
-                    break
-                if line.strip():
-                    summary_text += line.strip() + " "
-        
-        return summary_text.strip()[:500]  # Limit to 500 chars
+        return " ".join(lines)[:500]  # Limit to 500 chars
     
-    def _extract_experience(self, text: str) -> List[str]:
+    def _extract_experience(self, lines: List[str]) -> List[str]:
         """Extract work experience entries."""
-        experience_keywords = ['experience', 'work history', 'employment', 'professional experience']
-        lines = text.split('\n')
-        
         experiences = []
-        capturing = False
         current_entry = ""
         
         for line in lines:
-            lower_line = line.lower().strip()
-            
-            if any(keyword in lower_line for keyword in experience_keywords):
-                capturing = True
-                continue
-            
-            if capturing:
-                # Stop at next major section
-                if any(keyword in lower_line for keyword in ['education', 'skills', 'certifications']):
-                    if current_entry:
-                        experiences.append(current_entry.strip())
-                    break
-                
-                if line.strip():
-                    # Detect new job entry (usually has dates or company name)
-                    if re.search(r'\d{4}', line):  # Year pattern
-                        if current_entry:
-                            experiences.append(current_entry.strip())
-                            current_entry = line.strip()
-                        else:
-                            current_entry = line.strip()
-                    else:
-                        current_entry += " " + line.strip()
+            # Detect new job entry (usually has dates or company name)
+            if YEAR_RE.search(line):  # Year pattern
+                if current_entry:
+                    experiences.append(current_entry.strip())
+                current_entry = line
+            else:
+                current_entry += " " + line
+        
+        if current_entry:
+            experiences.append(current_entry.strip())
         
         return experiences[:5]  # Return top 5 experiences
     
-    def _extract_education(self, text: str) -> List[str]:
+    def _extract_education(self, lines: List[str]) -> List[str]:
         """Extract education entries."""
-        education_keywords = ['education', 'academic', 'qualifications']
-        lines = text.split('\n')
-        
-        education = []
-        capturing = False
-        
-        for line in lines:
-            lower_line = line.lower().strip()
-            
-            if any(keyword in lower_line for keyword in education_keywords):
-                capturing = True
-                continue
-            
-            if capturing:
-                if any(keyword in lower_line for keyword in ['experience', 'skills', 'certifications']):
-                    break
-                
-                if line.strip() and (re.search(r'\b(university|college|bachelor|master|phd|degree)\b', line, re.IGNORECASE) or re.search(r'\d{4}', line)):
-                    education.append(line.strip())
-        
+        education = [
+            line for line in lines
+            if EDUCATION_RE.search(line) or YEAR_RE.search(line)
+        ]
         return education[:3]  # Return top 3 education entries
     
-    def _extract_skills(self, text: str) -> List[str]:
-        """Extract skills from CV."""
-        skills_keywords = ['skills', 'technical skills', 'core competencies', 'expertise']
-        lines = text.split('\n')
-        
+    def _extract_skills(self, lines: List[str]) -> Tuple[str, ...]:
+        """Extract skills from CV (top 20, interned so repeats across CVs share storage)."""
         skills = []
-        capturing = False
         
         for line in lines:
-            lower_line = line.lower().strip()
-            
-            if any(keyword in lower_line for keyword in skills_keywords):
-                capturing = True
-                continue
-            
-            if capturing:
-                if any(keyword in lower_line for keyword in ['experience', 'education', 'certifications', 'references']):
-                    break
-                
-                if line.strip():
-                    # Split by common delimiters
-                    potential_skills = re.split(r'[,•|]', line)
-                    for skill in potential_skills:
-                        cleaned_skill = skill.strip()
-                        if cleaned_skill and len(cleaned_skill) > 2:
-                            skills.append(cleaned_skill)
-        
-        return skills[:20]  # Return top 20 skills
+            # Split by common delimiters
+            potential_skills = SKILL_DELIMITER_RE.split(line)
+            for skill in potential_skills:
+                cleaned_skill = skill.strip()
+                if cleaned_skill and len(cleaned_skill) > 2:
+                    skills.append(sys.intern(cleaned_skill))
+                    if len(skills) == 20:
+                        return tuple(skills)
+        
+        return tuple(skills)
     
     def parse(self, file_path: str) -> Dict:
         """Main parse method - detects file type and parses accordingly."""
@@ -207,6 +233,16 @@ class CVParser:
             raise ValueError("Unsupported file format. Only PDF and DOCX are supported.")
 
 
+def parse_file(file_path: str) -> Dict:
+    """
+    Parse a CV file with a fresh parser.
+    
+    A plain module-level function, so process pools pickle it by reference
+    instead of pickling a caller's parser object.
+    """
+    return CVParser().parse(file_path)
+
+
 # Example usage
 if __name__ == "__main__":
     parser = CVParser()
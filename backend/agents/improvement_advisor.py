@@ -3,20 +3,99 @@ Agent 3: CV Improvement Advisor
 Provides actionable suggestions to improve CV based on ATS analysis.
 """
 
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Optional
+from agents.term_matcher import build_term_matcher, lower_text
+
+
+# Fixed suggestion templates, built once; each call returns copies so
+# callers can modify their results, and the keyword and structure ones
+# only fill in their suggestion text per CV
+CONTACT_SUGGESTION = {
+    'category': 'Contact Information',
+    'issue': 'Missing contact details',
+    'suggestion': 'Add complete contact information: professional email, phone number, and LinkedIn profile at the top of your CV'
+}
+FORMATTING_SUGGESTION = {
+    'category': 'Formatting',
+    'issue': 'ATS may struggle to read your CV',
+    'suggestion': 'Use simple formatting: no tables, columns, text boxes, or graphics. Use standard fonts (Arial, Calibri, Times New Roman). Stick to bullets and clear section headers.'
+}
+ACTION_VERBS_SUGGESTION = {
+    'category': 'Language',
+    'issue': 'Weak verb usage',
+    'suggestion': 'Start bullet points with strong action verbs like: achieved, improved, led, developed, increased, implemented, optimized'
+}
+ACHIEVEMENTS_SUGGESTION = {
+    'category': 'Impact',
+    'issue': 'Lack of quantifiable achievements',
+    'suggestion': 'Add numbers and metrics to demonstrate impact. Examples: "Increased sales by 30%", "Managed team of 10", "Reduced costs by $50K annually"'
+}
+OVERALL_SUGGESTION = {
+    'category': 'Overall',
+    'issue': 'CV needs significant improvement',
+    'suggestion': 'Consider using a professional CV template and getting feedback from career services or a mentor'
+}
+TOO_SHORT_SUGGESTION = {
+    'category': 'Content Length',
+    'issue': 'CV is too short',
+    'suggestion': 'Expand your experience descriptions. Aim for 400-800 words total (1-2 pages).'
+}
+TOO_LONG_SUGGESTION = {
+    'category': 'Content Length',
+    'issue': 'CV is too long',
+    'suggestion': 'Condense content to 1-2 pages. Focus on most recent and relevant experience.'
+}
+SKILLS_SUGGESTION = {
+    'category': 'Skills',
+    'issue': 'Limited skills listed',
+    'suggestion': 'Add a dedicated "Skills" section with 8-15 relevant technical and soft skills'
+}
+KEYWORDS_SUGGESTION = {
+    'category': 'Keywords',
+    'issue': 'Missing important keywords'
+}
+STRUCTURE_SUGGESTION = {
+    'category': 'Structure',
+    'issue': 'Missing key sections'
+}
+
+# Keywords employers look for in each role category
+ROLE_KEYWORDS = {
+    'software_engineer': ('Python', 'Java', 'JavaScript', 'SQL', 'Git', 'AWS', 'Docker', 'REST API', 'Agile', 'CI/CD'),
+    'data_scientist': ('Python', 'R', 'Machine Learning', 'SQL', 'Statistics', 'TensorFlow', 'PyTorch', 'Data Visualization', 'Pandas', 'NumPy'),
+    'project_manager': ('Agile', 'Scrum', 'Stakeholder Management', 'Risk Management', 'Budgeting', 'JIRA', 'Microsoft Project', 'Leadership'),
+    'marketing': ('SEO', 'Google Analytics', 'Content Marketing', 'Social Media', 'Email Marketing', 'Adobe Creative Suite', 'Copywriting'),
+    'finance': ('Financial Modeling', 'Excel', 'Accounting', 'Bloomberg', 'Risk Analysis', 'Financial Reporting', 'SAP', 'QuickBooks')
+}
+
+# Suggested when the job title matches no role category
+GENERIC_KEYWORDS = ('Leadership', 'Communication', 'Problem Solving', 'Project Management', 'Team Collaboration')
+
+# Job title terms and the keyword category they select, checked in this order
+TITLE_CATEGORIES = (
+    (('software', 'developer', 'engineer', 'programmer'), 'software_engineer'),
+    (('data', 'scientist', 'analyst', 'machine learning'), 'data_scientist'),
+    (('project manager', 'program manager', 'scrum master'), 'project_manager'),
+    (('marketing', 'brand', 'content'), 'marketing'),
+    (('finance', 'accounting', 'financial'), 'finance'),
+)
+
+
+@lru_cache(maxsize=512)
+def _category_for_title(job_title_lower: str) -> Optional[str]:
+    """Map a lowercased job title to a keyword category, or None for generic advice."""
+    for terms, category in TITLE_CATEGORIES:
+        if any(term in job_title_lower for term in terms):
+            return category
+    return None
 
 
 class ImprovementAdvisor:
     """Generates specific, actionable CV improvement recommendations."""
     
     def __init__(self):
-        self.common_keywords = {
-            'software_engineer': ['Python', 'Java', 'JavaScript', 'SQL', 'Git', 'AWS', 'Docker', 'REST API', 'Agile', 'CI/CD'],
-            'data_scientist': ['Python', 'R', 'Machine Learning', 'SQL', 'Statistics', 'TensorFlow', 'PyTorch', 'Data Visualization', 'Pandas', 'NumPy'],
-            'project_manager': ['Agile', 'Scrum', 'Stakeholder Management', 'Risk Management', 'Budgeting', 'JIRA', 'Microsoft Project', 'Leadership'],
-            'marketing': ['SEO', 'Google Analytics', 'Content Marketing', 'Social Media', 'Email Marketing', 'Adobe Creative Suite', 'Copywriting'],
-            'finance': ['Financial Modeling', 'Excel', 'Accounting', 'Bloomberg', 'Risk Analysis', 'Financial Reporting', 'SAP', 'QuickBooks']
-        }
+        self.common_keywords = ROLE_KEYWORDS
     
     def generate_advice(self, ats_result: Dict, cv_data: Dict, job_title: str = "") -> Dict:
         """
@@ -41,86 +120,49 @@ class ImprovementAdvisor:
         
         # Contact Information
         if score_breakdown['contact'] < 8:
-            suggestions['critical'].append({
-                'category': 'Contact Information',
-                'issue': 'Missing contact details',
-                'suggestion': 'Add complete contact information: professional email, phone number, and LinkedIn profile at the top of your CV'
-            })
+            suggestions['critical'].append(dict(CONTACT_SUGGESTION))
         
         # Formatting
         if score_breakdown['formatting'] < 15:
-            suggestions['critical'].append({
-                'category': 'Formatting',
-                'issue': 'ATS may struggle to read your CV',
-                'suggestion': 'Use simple formatting: no tables, columns, text boxes, or graphics. Use standard fonts (Arial, Calibri, Times New Roman). Stick to bullets and clear section headers.'
-            })
+            suggestions['critical'].append(dict(FORMATTING_SUGGESTION))
         
         # Keywords
         if score_breakdown['keywords'] < 18:
             keyword_suggestions = self._get_keyword_suggestions(cv_data, job_title)
             suggestions['important'].append({
-                'category': 'Keywords',
-                'issue': 'Missing important keywords',
+                **KEYWORDS_SUGGESTION,
                 'suggestion': f"Add these relevant keywords to your experience/skills sections: {', '.join(keyword_suggestions[:8])}"
             })
         
         # Action Verbs
         if score_breakdown['action_verbs'] < 10:
-            suggestions['important'].append({
-                'category': 'Language',
-                'issue': 'Weak verb usage',
-                'suggestion': 'Start bullet points with strong action verbs like: achieved, improved, led, developed, increased, implemented, optimized'
-            })
+            suggestions['important'].append(dict(ACTION_VERBS_SUGGESTION))
         
         # Structure
         if score_breakdown['structure'] < 12:
             structure_fixes = self._get_structure_fixes(cv_data)
             if structure_fixes:
-                suggestions['critical'].append({
-                    'category': 'Structure',
-                    'issue': 'Missing key sections',
-                    'suggestion': structure_fixes
-                })
+                suggestions['critical'].append({**STRUCTURE_SUGGESTION, 'suggestion': structure_fixes})
         
         # Achievements
         if score_breakdown['achievements'] < 10:
-            suggestions['important'].append({
-                'category': 'Impact',
-                'issue': 'Lack of quantifiable achievements',
-                'suggestion': 'Add numbers and metrics to demonstrate impact. Examples: "Increased sales by 30%", "Managed team of 10", "Reduced costs by $50K annually"'
-            })
+            suggestions['important'].append(dict(ACHIEVEMENTS_SUGGESTION))
         
         # Additional suggestions based on total score
         if total_score < 60:
-            suggestions['critical'].append({
-                'category': 'Overall',
-                'issue': 'CV needs significant improvement',
-                'suggestion': 'Consider using a professional CV template and getting feedback from career services or a mentor'
-            })
+            suggestions['critical'].append(dict(OVERALL_SUGGESTION))
         
         # Word count
         word_count = cv_data.get('total_word_count', 0)
         if word_count < 300:
-            suggestions['important'].append({
-                'category': 'Content Length',
-                'issue': 'CV is too short',
-                'suggestion': 'Expand your experience descriptions. Aim for 400-800 words total (1-2 pages).'
-            })
+            suggestions['important'].append(dict(TOO_SHORT_SUGGESTION))
         elif word_count > 1200:
-            suggestions['nice_to_have'].append({
-                'category': 'Content Length',
-                'issue': 'CV is too long',
-                'suggestion': 'Condense content to 1-2 pages. Focus on most recent and relevant experience.'
-            })
+            suggestions['nice_to_have'].append(dict(TOO_LONG_SUGGESTION))
         
         # Skills section
         skills_count = len(cv_data.get('skills', []))
         if skills_count < 5:
-            suggestions['important'].append({
-                'category': 'Skills',
-                'issue': 'Limited skills listed',
-                'suggestion': 'Add a dedicated "Skills" section with 8-15 relevant technical and soft skills'
-            })
+            suggestions['important'].append(dict(SKILLS_SUGGESTION))
         
         return {
             'total_suggestions': len(suggestions['critical']) + len(suggestions['important']) + len(suggestions['nice_to_have']),
@@ -135,44 +177,40 @@ class ImprovementAdvisor:
     
     def _get_keyword_suggestions(self, cv_data: Dict, job_title: str) -> List[str]:
         """Suggest missing keywords based on job title."""
-        # Determine job category
-        job_lower = job_title.lower()
-        suggested_keywords = []
-        
-        if any(term in job_lower for term in ['software', 'developer', 'engineer', 'programmer']):
-            suggested_keywords = self.common_keywords['software_engineer']
-        elif any(term in job_lower for term in ['data', 'scientist', 'analyst', 'machine learning']):
-            suggested_keywords = self.common_keywords['data_scientist']
-        elif any(term in job_lower for term in ['project manager', 'program manager', 'scrum master']):
-            suggested_keywords = self.common_keywords['project_manager']
-        elif any(term in job_lower for term in ['marketing', 'brand', 'content']):
-            suggested_keywords = self.common_keywords['marketing']
-        elif any(term in job_lower for term in ['finance', 'accounting', 'financial']):
-            suggested_keywords = self.common_keywords['finance']
+        # Determine job category; titles repeat across CVs, so this is cached
+        category = _category_for_title(job_title.lower())
+        
+        if category is not None:
+            suggested_keywords = self.common_keywords[category]
         else:
             # Generic suggestions
-            suggested_keywords = ['Leadership', 'Communication', 'Problem Solving', 'Project Management', 'Team Collaboration']
+            suggested_keywords = GENERIC_KEYWORDS
         
-        # Filter out keywords already in CV
-        cv_text = cv_data.get('raw_text', '').lower()
-        missing_keywords = [kw for kw in suggested_keywords if kw.lower() not in cv_text]
+        # Filter out keywords already in CV, scanning the CV text once for all of them
+        find_keywords = build_term_matcher(tuple(kw.lower() for kw in suggested_keywords))
+        found = find_keywords(lower_text(cv_data.get('raw_text', '')))
+        missing_keywords = [kw for kw in suggested_keywords if kw.lower() not in found]
         
         return missing_keywords
     
     def _get_structure_fixes(self, cv_data: Dict) -> str:
         """Suggest structural improvements."""
         missing = []
+        summary = cv_data.get('summary') or ''
+        experience = cv_data.get('experience') or []
+        education = cv_data.get('education') or []
+        skills = cv_data.get('skills') or []
         
-        if not cv_data.get('summary') or len(cv_data.get('summary', '')) < 50:
+        if len(summary) < 50:
             missing.append('Professional Summary (2-3 sentences describing your expertise)')
         
-        if not cv_data.get('experience') or len(cv_data.get('experience', [])) == 0:
+        if not experience:
             missing.append('Work Experience section with job titles, companies, dates, and achievements')
         
-        if not cv_data.get('education') or len(cv_data.get('education', [])) == 0:
+        if not education:
             missing.append('Education section with degrees, institutions, and graduation dates')
         
-        if not cv_data.get('skills') or len(cv_data.get('skills', [])) < 5:
+        if len(skills) < 5:
             missing.append('Skills section listing relevant technical and soft skills')
         
         if missing:
@@ -3,14 +3,46 @@ Agent 4: Job API Aggregator
 Fetches jobs from multiple APIs (Adzuna, Reed, JSearch) and normalizes data.
 """
 
-import requests
+import asyncio
+import httpx
 import os
-from typing import List, Dict, Optional
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 
+try:
+    import h2
+except ImportError:  # HTTP/2 needs the h2 package; fall back to HTTP/1.1
+    h2 = None
+
 load_dotenv()
 
 
+# How long an API response is reused for an identical search, and how many
+# distinct searches are remembered
+RESPONSE_CACHE_TTL_SECONDS = 600
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# Per-request timeout for the job APIs, in seconds
+API_TIMEOUT = 10
+
+# Transient failures are retried with exponential backoff (0.3s, 0.6s) rather
+# than failing the provider for the whole search
+API_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.3
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+API_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+
+# Runs of whitespace and punctuation (any script), so "Google Inc." and
+# "Google, Inc" reduce to the same deduplication key; + and # are kept so
+# "C++" and "C#" stay distinct
+DEDUP_SEPARATOR_RE = re.compile(r'(?:[^\w+#]|_)+')
+
+
 class JobAggregator:
     """Aggregates job listings from multiple job search APIs."""
     
@@ -24,12 +56,30 @@ class JobAggregator:
         self.adzuna_base_url = "https://api.adzuna.com/v1/api/jobs/gb/search"
         self.reed_base_url = "https://www.reed.co.uk/api/1.0/search"
         self.jsearch_base_url = "https://jsearch.p.rapidapi.com/search"
+        
+        # Shared clients keep connections to each API alive between calls,
+        # multiplexed over HTTP/2 when h2 is installed; the transports retry
+        # failed connection attempts
+        self.client = httpx.Client(
+            transport=httpx.HTTPTransport(http2=h2 is not None, limits=API_LIMITS, retries=API_RETRIES),
+            timeout=API_TIMEOUT
+        )
+        self.async_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(http2=h2 is not None, limits=API_LIMITS, retries=API_RETRIES),
+            timeout=API_TIMEOUT
+        )
+        
+        # Recent API responses keyed on (url, params); repeat searches skip
+        # the network round-trip and the rate-limit quota
+        self._response_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def fetch_all_jobs(self, 
                        job_title: str, 
                        location: str, 
                        radius_miles: int = 20,
-                       max_results: int = 50) -> List[Dict]:
+                       max_results: int = 50,
+                       force_refresh: bool = False) -> List[Dict]:
         """
         Fetch jobs from all available APIs and combine results.
         
@@ -38,204 +88,394 @@ class JobAggregator:
             location: Location (city or postcode)
             radius_miles: Search radius in miles
             max_results: Maximum number of results per API
+            force_refresh: Query every API even if an identical search is cached
             
         Returns:
             List of normalized job dictionaries
         """
-        all_jobs = []
+        jobs = list(self.iter_all_jobs(job_title, location, radius_miles, max_results, force_refresh))
+        print(f"Unique jobs after deduplication: {len(jobs)}")
         
-        # Fetch from each API
-        print("Fetching from Adzuna...")
-        adzuna_jobs = self.fetch_adzuna(job_title, location, radius_miles, max_results)
-        all_jobs.extend(adzuna_jobs)
+        return jobs
+    
+    async def fetch_all_jobs_async(self,
+                                   job_title: str,
+                                   location: str,
+                                   radius_miles: int = 20,
+                                   max_results: int = 50,
+                                   force_refresh: bool = False) -> List[Dict]:
+        """
+        Async version of fetch_all_jobs for use inside the FastAPI event loop.
         
-        print("Fetching from Reed...")
-        reed_jobs = self.fetch_reed(job_title, location, radius_miles, max_results)
-        all_jobs.extend(reed_jobs)
+        The three APIs are awaited together on the shared async client, so no
+        worker threads are needed. Duplicates resolve in Adzuna, Reed, JSearch
+        order.
+        """
+        print("Fetching from Adzuna, Reed and JSearch (RapidAPI)...")
+        sources = ('Adzuna', 'Reed', 'JSearch')
+        results = await asyncio.gather(
+            self.fetch_adzuna_async(job_title, location, radius_miles, max_results, force_refresh),
+            self.fetch_reed_async(job_title, location, radius_miles, max_results, force_refresh),
+            self.fetch_jsearch_async(job_title, location, max_results, force_refresh),
+            return_exceptions=True
+        )
         
-        print("Fetching from JSearch (RapidAPI)...")
-        jsearch_jobs = self.fetch_jsearch(job_title, location, max_results)
-        all_jobs.extend(jsearch_jobs)
+        batches = []
+        for source, result in zip(sources, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching from {source}: {result}")
+            else:
+                batches.append(result)
         
-        print(f"Total jobs fetched: {len(all_jobs)}")
+        print(f"Total jobs fetched: {sum(len(batch) for batch in batches)}")
         
-        # Remove duplicates based on title + company
-        unique_jobs = self._remove_duplicates(all_jobs)
-        print(f"Unique jobs after deduplication: {len(unique_jobs)}")
+        jobs = list(self._unique_jobs(batches))
+        print(f"Unique jobs after deduplication: {len(jobs)}")
         
-        return unique_jobs
+        return jobs
     
-    def fetch_adzuna(self, job_title: str, location: str, radius_miles: int, max_results: int) -> List[Dict]:
+    def iter_all_jobs(self,
+                      job_title: str,
+                      location: str,
+                      radius_miles: int = 20,
+                      max_results: int = 50,
+                      force_refresh: bool = False) -> Iterator[Dict]:
+        """
+        Yield unique normalized jobs from all available APIs as each one responds.
+        
+        Takes the same arguments as fetch_all_jobs. Deduplication happens as
+        jobs arrive, so the first API to answer wins a duplicate and callers
+        can start on its jobs while slower APIs are still in flight.
+        """
+        # Fetch from every API concurrently; the requests are I/O bound, so
+        # the total wait is the slowest API rather than the sum of all three
+        print("Fetching from Adzuna, Reed and JSearch (RapidAPI)...")
+        total_fetched = 0
+        
+        def completed_batches():
+            nonlocal total_fetched
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = {
+                    executor.submit(self.fetch_adzuna, job_title, location, radius_miles, max_results, force_refresh): 'Adzuna',
+                    executor.submit(self.fetch_reed, job_title, location, radius_miles, max_results, force_refresh): 'Reed',
+                    executor.submit(self.fetch_jsearch, job_title, location, max_results, force_refresh): 'JSearch',
+                }
+                
+                for future in as_completed(futures):
+                    try:
+                        jobs = future.result()
+                    except Exception as e:
+                        print(f"Error fetching from {futures[future]}: {e}")
+                        continue
+                    
+                    total_fetched += len(jobs)
+                    yield jobs
+        
+        yield from self._unique_jobs(completed_batches())
+        
+        print(f"Total jobs fetched: {total_fetched}")
+    
+    def fetch_adzuna(self, job_title: str, location: str, radius_miles: int, max_results: int,
+                     force_refresh: bool = False) -> List[Dict]:
         """Fetch jobs from Adzuna API."""
+        request = self._adzuna_request(job_title, location, radius_miles, max_results)
+        data = self._get_json('Adzuna', request, force_refresh)
+        return self._normalize_adzuna(data, location)
+    
+    async def fetch_adzuna_async(self, job_title: str, location: str, radius_miles: int, max_results: int,
+                                 force_refresh: bool = False) -> List[Dict]:
+        """Async version of fetch_adzuna."""
+        request = self._adzuna_request(job_title, location, radius_miles, max_results)
+        data = await self._get_json_async('Adzuna', request, force_refresh)
+        return self._normalize_adzuna(data, location)
+    
+    def fetch_reed(self, job_title: str, location: str, radius_miles: int, max_results: int,
+                   force_refresh: bool = False) -> List[Dict]:
+        """Fetch jobs from Reed API."""
+        request = self._reed_request(job_title, location, radius_miles, max_results)
+        data = self._get_json('Reed', request, force_refresh)
+        return self._normalize_reed(data, location)
+    
+    async def fetch_reed_async(self, job_title: str, location: str, radius_miles: int, max_results: int,
+                               force_refresh: bool = False) -> List[Dict]:
+        """Async version of fetch_reed."""
+        request = self._reed_request(job_title, location, radius_miles, max_results)
+        data = await self._get_json_async('Reed', request, force_refresh)
+        return self._normalize_reed(data, location)
+    
+    def fetch_jsearch(self, job_title: str, location: str, max_results: int,
+                      force_refresh: bool = False) -> List[Dict]:
+        """Fetch jobs from JSearch API (RapidAPI)."""
+        request = self._jsearch_request(job_title, location)
+        data = self._get_json('JSearch', request, force_refresh)
+        return self._normalize_jsearch(data, location, max_results)
+    
+    async def fetch_jsearch_async(self, job_title: str, location: str, max_results: int,
+                                  force_refresh: bool = False) -> List[Dict]:
+        """Async version of fetch_jsearch."""
+        request = self._jsearch_request(job_title, location)
+        data = await self._get_json_async('JSearch', request, force_refresh)
+        return self._normalize_jsearch(data, location, max_results)
+    
+    def _adzuna_request(self, job_title: str, location: str, radius_miles: int,
+                        max_results: int) -> Optional[Tuple[str, Dict, Optional[Dict]]]:
+        """Build the Adzuna (url, params, headers), or None without credentials."""
         if not self.adzuna_app_id or not self.adzuna_api_key:
             print("Adzuna API credentials not found")
-            return []
+            return None
         
-        try:
-            url = f"{self.adzuna_base_url}/1"
-            params = {
-                'app_id': self.adzuna_app_id,
-                'app_key': self.adzuna_api_key,
-                'what': job_title,
-                'where': location,
-                'distance': radius_miles,
-                'results_per_page': min(max_results, 50),
-                'content-type': 'application/json'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            jobs = data.get('results', [])
-            
-            # Normalize Adzuna jobs
-            normalized = []
-            for job in jobs:
-                normalized.append({
-                    'source': 'Adzuna',
-                    'job_id': job.get('id', ''),
-                    'title': job.get('title', ''),
-                    'company': job.get('company', {}).get('display_name', 'Unknown'),
-                    'location': job.get('location', {}).get('display_name', location),
-                    'description': job.get('description', ''),
-                    'salary_min': job.get('salary_min'),
-                    'salary_max': job.get('salary_max'),
-                    'contract_type': job.get('contract_type', 'Not specified'),
-                    'created': job.get('created', ''),
-                    'redirect_url': job.get('redirect_url', ''),
-                    'distance': None  # Adzuna doesn't provide distance
-                })
-            
-            return normalized
+        url = f"{self.adzuna_base_url}/1"
+        params = {
+            'app_id': self.adzuna_app_id,
+            'app_key': self.adzuna_api_key,
+            'what': job_title,
+            'where': location,
+            'distance': radius_miles,
+            'results_per_page': min(max_results, 50),
+            'content-type': 'application/json'
+        }
         
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching from Adzuna: {e}")
-            return []
+        return url, params, None
     
-    def fetch_reed(self, job_title: str, location: str, radius_miles: int, max_results: int) -> List[Dict]:
-        """Fetch jobs from Reed API."""
+    def _reed_request(self, job_title: str, location: str, radius_miles: int,
+                      max_results: int) -> Optional[Tuple[str, Dict, Optional[Dict]]]:
+        """Build the Reed (url, params, headers), or None without an API key."""
         if not self.reed_api_key:
             print("Reed API key not found")
-            return []
+            return None
         
-        try:
-            url = self.reed_base_url
-            params = {
-                'keywords': job_title,
-                'location': location,
-                'distancefromlocation': radius_miles,
-                'resultsToTake': min(max_results, 100)
-            }
-            
-            headers = {
-                'Authorization': f'Basic {self.reed_api_key}'
-            }
+        url = self.reed_base_url
+        params = {
+            'keywords': job_title,
+            'location': location,
+            'distancefromlocation': radius_miles,
+            'resultsToTake': min(max_results, 100)
+        }
+        
+        headers = {
+            'Authorization': f'Basic {self.reed_api_key}'
+        }
+        
+        return url, params, headers
+    
+    def _jsearch_request(self, job_title: str, location: str) -> Optional[Tuple[str, Dict, Optional[Dict]]]:
+        """Build the JSearch (url, params, headers), or None without an API key."""
+        if not self.rapidapi_key:
+            print("RapidAPI key not found")
+            return None
+        
+        url = self.jsearch_base_url
+        params = {
+            'query': f"{job_title} in {location}",
+            'page': '1',
+            'num_pages': '1',
+            'date_posted': 'all'
+        }
+        
+        headers = {
+            'X-RapidAPI-Key': self.rapidapi_key,
+            'X-RapidAPI-Host': 'jsearch.p.rapidapi.com'
+        }
+        
+        return url, params, headers
+    
+    def _normalize_adzuna(self, data: Dict, location: str) -> List[Dict]:
+        """Normalize an Adzuna response into job dictionaries."""
+        jobs = data.get('results', [])
+        
+        # Normalize Adzuna jobs
+        normalized = []
+        for job in jobs:
+            normalized.append({
+                'source': 'Adzuna',
+                'job_id': job.get('id', ''),
+                'title': job.get('title', ''),
+                'company': job.get('company', {}).get('display_name', 'Unknown'),
+                'location': job.get('location', {}).get('display_name', location),
+                'description': job.get('description', ''),
+                'salary_min': job.get('salary_min'),
+                'salary_max': job.get('salary_max'),
+                'contract_type': job.get('contract_type', 'Not specified'),
+                'created': job.get('created', ''),
+                'redirect_url': job.get('redirect_url', ''),
+                'distance': None  # Adzuna doesn't provide distance
+            })
+        
+        return normalized
+    
+    def _normalize_reed(self, data: Dict, location: str) -> List[Dict]:
+        """Normalize a Reed response into job dictionaries."""
+        jobs = data.get('results', [])
+        
+        # Normalize Reed jobs
+        normalized = []
+        for job in jobs:
+            normalized.append({
+                'source': 'Reed',
+                'job_id': job.get('jobId', ''),
+                'title': job.get('jobTitle', ''),
+                'company': job.get('employerName', 'Unknown'),
+                'location': job.get('locationName', location),
+                'description': job.get('jobDescription', ''),
+                'salary_min': job.get('minimumSalary'),
+                'salary_max': job.get('maximumSalary'),
+                'contract_type': job.get('contractType', 'Not specified'),
+                'created': job.get('date', ''),
+                'redirect_url': job.get('jobUrl', ''),
+                'distance': job.get('distance')
+            })
+        
+        return normalized
+    
+    def _normalize_jsearch(self, data: Dict, location: str, max_results: int) -> List[Dict]:
+        """Normalize a JSearch response into job dictionaries."""
+        jobs = data.get('data', [])[:max_results]
+        
+        # Normalize JSearch jobs
+        normalized = []
+        for job in jobs:
+            # Extract salary if available
+            salary_min = None
+            salary_max = None
+            if job.get('job_salary'):
+                salary_min = job['job_salary'].get('min_salary')
+                salary_max = job['job_salary'].get('max_salary')
             
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            normalized.append({
+                'source': 'JSearch',
+                'job_id': job.get('job_id', ''),
+                'title': job.get('job_title', ''),
+                'company': job.get('employer_name', 'Unknown'),
+                'location': job.get('job_city', location),
+                'description': job.get('job_description', ''),
+                'salary_min': salary_min,
+                'salary_max': salary_max,
+                'contract_type': job.get('job_employment_type', 'Not specified'),
+                'created': job.get('job_posted_at_datetime_utc', ''),
+                'redirect_url': job.get('job_apply_link', ''),
+                'distance': None
+            })
+        
+        return normalized
+    
+    def _get_json(self, source: str, request: Optional[Tuple[str, Dict, Optional[Dict]]],
+                  force_refresh: bool = False) -> Dict:
+        """
+        GET an API endpoint and return its JSON body, reusing a recent response
+        for the same url and params.
+        
+        Returns an empty dict when the API is not configured or the request
+        fails. Only successful responses are cached, so a failed request is
+        retried on the next search instead of being pinned for the whole TTL.
+        """
+        if request is None:
+            return {}
+        
+        url, params, headers = request
+        key = self._cache_key(url, params)
+        if not force_refresh:
+            cached = self._cached_response(key)
+            if cached is not None:
+                return cached
+        
+        try:
+            # Retry 5xx responses with backoff; other errors fail straight away
+            for attempt in range(API_RETRIES + 1):
+                response = self.client.get(url, params=params, headers=headers)
+                if response.status_code not in RETRY_STATUSES or attempt == API_RETRIES:
+                    break
+                time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
             response.raise_for_status()
-            
             data = response.json()
-            jobs = data.get('results', [])
-            
-            # Normalize Reed jobs
-            normalized = []
-            for job in jobs:
-                normalized.append({
-                    'source': 'Reed',
-                    'job_id': job.get('jobId', ''),
-                    'title': job.get('jobTitle', ''),
-                    'company': job.get('employerName', 'Unknown'),
-                    'location': job.get('locationName', location),
-                    'description': job.get('jobDescription', ''),
-                    'salary_min': job.get('minimumSalary'),
-                    'salary_max': job.get('maximumSalary'),
-                    'contract_type': job.get('contractType', 'Not specified'),
-                    'created': job.get('date', ''),
-                    'redirect_url': job.get('jobUrl', ''),
-                    'distance': job.get('distance')
-                })
-            
-            return normalized
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error fetching from {source}: {e}")
+            return {}
         
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching from Reed: {e}")
-            return []
+        self._store_response(key, data)
+        return data
     
-    def fetch_jsearch(self, job_title: str, location: str, max_results: int) -> List[Dict]:
-        """Fetch jobs from JSearch API (RapidAPI)."""
-        if not self.rapidapi_key:
-            print("RapidAPI key not found")
-            return []
+    async def _get_json_async(self, source: str, request: Optional[Tuple[str, Dict, Optional[Dict]]],
+                              force_refresh: bool = False) -> Dict:
+        """Async version of _get_json, sharing the same response cache."""
+        if request is None:
+            return {}
+        
+        url, params, headers = request
+        key = self._cache_key(url, params)
+        if not force_refresh:
+            cached = self._cached_response(key)
+            if cached is not None:
+                return cached
         
         try:
-            url = self.jsearch_base_url
-            params = {
-                'query': f"{job_title} in {location}",
-                'page': '1',
-                'num_pages': '1',
-                'date_posted': 'all'
-            }
-            
-            headers = {
-                'X-RapidAPI-Key': self.rapidapi_key,
-                'X-RapidAPI-Host': 'jsearch.p.rapidapi.com'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            for attempt in range(API_RETRIES + 1):
+                response = await self.async_client.get(url, params=params, headers=headers)
+                if response.status_code not in RETRY_STATUSES or attempt == API_RETRIES:
+                    break
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
             response.raise_for_status()
-            
             data = response.json()
-            jobs = data.get('data', [])[:max_results]
-            
-            # Normalize JSearch jobs
-            normalized = []
-            for job in jobs:
-                # Extract salary if available
-                salary_min = None
-                salary_max = None
-                if job.get('job_salary'):
-                    salary_min = job['job_salary'].get('min_salary')
-                    salary_max = job['job_salary'].get('max_salary')
-                
-                normalized.append({
-                    'source': 'JSearch',
-                    'job_id': job.get('job_id', ''),
-                    'title': job.get('job_title', ''),
-                    'company': job.get('employer_name', 'Unknown'),
-                    'location': job.get('job_city', location),
-                    'description': job.get('job_description', ''),
-                    'salary_min': salary_min,
-                    'salary_max': salary_max,
-                    'contract_type': job.get('job_employment_type', 'Not specified'),
-                    'created': job.get('job_posted_at_datetime_utc', ''),
-                    'redirect_url': job.get('job_apply_link', ''),
-                    'distance': None
-                })
-            
-            return normalized
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Error fetching from {source}: {e}")
+            return {}
         
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching from JSearch: {e}")
-            return []
+        self._store_response(key, data)
+        return data
+    
+    @staticmethod
+    def _cache_key(url: str, params: Dict) -> Tuple:
+        """Cache key for a GET request; params are order-insensitive."""
+        return url, tuple(sorted((k, str(v)) for k, v in params.items()))
+    
+    def _cached_response(self, key: Tuple) -> Optional[Dict]:
+        """Return the cached JSON body for key if it is younger than the TTL."""
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL_SECONDS:
+                self._response_cache.move_to_end(key)
+                return cached[1]
+        return None
     
-    def _remove_duplicates(self, jobs: List[Dict]) -> List[Dict]:
-        """Remove duplicate jobs based on title and company."""
+    def _store_response(self, key: Tuple, data: Dict):
+        """Cache a successful JSON body, evicting the oldest search when full."""
+        with self._cache_lock:
+            self._response_cache[key] = (time.monotonic(), data)
+            self._response_cache.move_to_end(key)
+            if len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                self._response_cache.popitem(last=False)
+    
+    def _unique_jobs(self, job_batches: Iterable[List[Dict]]) -> Iterator[Dict]:
+        """Yield jobs from each batch in turn, skipping duplicates of earlier jobs."""
         seen = set()
-        unique_jobs = []
-        
-        for job in jobs:
-            # Create a key from title and company (normalized)
-            key = (
-                job.get('title', '').lower().strip(),
-                job.get('company', '').lower().strip()
-            )
-            
-            if key not in seen and key != ('', ''):
-                seen.add(key)
-                unique_jobs.append(job)
+        for jobs in job_batches:
+            # Remove duplicates based on title + company
+            for job in jobs:
+                key = self._job_key(job)
+                if key is not None and key not in seen:
+                    seen.add(key)
+                    self._add_search_fields(job)
+                    yield job
+    
+    @staticmethod
+    def _add_search_fields(job: Dict):
+        """Store lowercased copies of the fields the matcher and ranker scan, so each is lowercased once."""
+        job['_desc_lc'] = (job.get('description') or '').lower()
+        job['_title_lc'] = (job.get('title') or '').lower()
+        job['_contract_lc'] = (job.get('contract_type') or '').lower()
+    
+    def _job_key(self, job: Dict) -> Optional[str]:
+        """Deduplication key from normalized title and company, or None if both are empty."""
+        raw_title = job.get('title') or ''
+        raw_company = job.get('company') or ''
+        if not raw_title and not raw_company:
+            return None
         
-        return unique_jobs
+        return f"{self._dedup_key(raw_title)}|{self._dedup_key(raw_company)}"
+    
+    @staticmethod
+    def _dedup_key(value: str) -> str:
+        """Casefold value and collapse punctuation and whitespace to single spaces."""
+        return DEDUP_SEPARATOR_RE.sub(' ', value.casefold()).strip()
 
 
 # Example usage
@@ -3,21 +3,70 @@ Agent 5: Job-CV Matcher
 Calculates similarity scores between CV and job descriptions using TF-IDF.
 """
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 import re
-from typing import Dict, List
+from typing import Dict, List, Set
 import numpy as np
+from agents.term_matcher import build_term_matcher, lower_text
+
+
+# Precompiled patterns used for every job
+HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+# Years of experience claimed in a CV, e.g. "5 years experience" or
+# "experience: 5+ years", found in one scan. The first branch stops short of
+# the keyword so it can still open a match of the second branch.
+CV_YEARS_RE = re.compile(
+    r'(\d+)\+?\s*years?\s*(?:of\s*)?(?=exp)'
+    r'|(?:experience|exp).*?(\d+)\+?\s*years?'
+)
+# Date ranges (YYYY - YYYY / present) used when no explicit claim is found
+DATE_RANGE_RE = re.compile(r'(\d{4})\s*[-–]\s*(\d{4}|present|current)')
+
+# Years required by a job, e.g. "5+ years required", "minimum 3 years"
+JOB_YEARS_RES = (
+    re.compile(r'(\d+)\+?\s*years?\s*(?:of\s*)?(?:experience|exp).*?(?:required|needed|minimum)'),
+    re.compile(r'(?:required|needed|minimum).*?(\d+)\+?\s*years?'),
+    re.compile(r'(\d+)\+?\s*years?\s*(?:in|of|with)'),
+)
+
+# Seniority terms and the years they imply, checked in this order when a job
+# states no explicit requirement
+SENIORITY_YEARS = (
+    (('senior', 'lead', 'principal'), 5),
+    (('mid-level', 'intermediate'), 3),
+    (('junior', 'entry', 'graduate'), 1),
+)
 
 
 class JobMatcher:
     """Matches jobs to CV using TF-IDF similarity and skill matching."""
     
+    # Common technical skills to look for
+    COMMON_SKILLS = (
+        'python', 'java', 'javascript', 'c++', 'sql', 'nosql', 'mongodb',
+        'react', 'angular', 'vue', 'node.js', 'django', 'flask',
+        'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'git',
+        'machine learning', 'data analysis', 'ai', 'deep learning',
+        'agile', 'scrum', 'jira', 'excel', 'powerpoint', 'communication',
+        'leadership', 'problem solving', 'project management'
+    )
+    
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=500,
+        # Hashing needs no vocabulary, so the vectorizer holds no fitted state
+        # and is safe to share between concurrent match_jobs calls
+        self.vectorizer = HashingVectorizer(
+            n_features=2 ** 14,
             stop_words='english',
-            ngram_range=(1, 2)  # Include bi-grams
+            ngram_range=(1, 2),  # Include bi-grams
+            alternate_sign=False,
+            norm=None  # Raw counts; TF-IDF weighting and normalization come after
+        )
+        
+        # One automaton over all skills, so each text is scanned once
+        self._find_skills = build_term_matcher(self.COMMON_SKILLS)
+        self._find_seniority = build_term_matcher(
+            tuple(term for terms, _ in SENIORITY_YEARS for term in terms)
         )
     
     def match_jobs(self, cv_data: Dict, jobs: List[Dict]) -> List[Dict]:
@@ -32,31 +81,44 @@ class JobMatcher:
             Jobs with added 'match_score' field (0-100)
         """
         cv_text = self._prepare_cv_text(cv_data)
+        job_texts = [self._prepare_job_text(job) for job in jobs]
         
-        for job in jobs:
-            job_text = self._prepare_job_text(job)
-           
-            # Calculate TF-IDF similarity
-            tfidf_score = self._calculate_tfidf_similarity(cv_text, job_text)
-            
-            # Calculate skill match score
-            skill_score = self._calculate_skill_match(cv_data, job)
-            
-            # Calculate experience level match
-            experience_score = self._calculate_experience_match(cv_data, job)
-            
-            # Weighted average (TF-IDF: 50%, Skills: 35%, Experience: 15%)
-            final_score = (tfidf_score * 0.5) + (skill_score * 0.35) + (experience_score * 0.15)
-            
-            job['match_score'] = round(final_score, 1)
+        # Calculate TF-IDF similarity for every job in one fit
+        tfidf_scores = self._calculate_tfidf_similarities(cv_text, job_texts)
+        
+        # The CV side of the skill and experience matches is the same for every job
+        cv_skills_found = self._find_cv_skills(cv_data)
+        experience_years = self._extract_years_of_experience(cv_data.get('raw_text', ''))
+        
+        # Calculate skill match and experience level match scores
+        # Each description is lowercased once and shared by both scores; the
+        # aggregator has usually done it already
+        descriptions_lower = [job.get('_desc_lc') or job.get('description', '').lower() for job in jobs]
+        skill_scores = np.array([
+            self._calculate_skill_match(cv_skills_found, description_lower)
+            for description_lower in descriptions_lower
+        ])
+        experience_scores = np.array([
+            self._calculate_experience_match(experience_years, description_lower)
+            for description_lower in descriptions_lower
+        ])
+        
+        # Weighted average (TF-IDF: 50%, Skills: 35%, Experience: 15%)
+        final_scores = (tfidf_scores * 0.5) + (skill_scores * 0.35) + (experience_scores * 0.15)
+        
+        match_scores = []
+        for i, job in enumerate(jobs):
+            job['match_score'] = round(float(final_scores[i]), 1)
             job['match_breakdown'] = {
-                'tfidf': round(tfidf_score, 1),
-                'skills': round(skill_score, 1),
-                'experience': round(experience_score, 1)
+                'tfidf': round(float(tfidf_scores[i]), 1),
+                'skills': round(float(skill_scores[i]), 1),
+                'experience': round(float(experience_scores[i]), 1)
             }
+            match_scores.append(job['match_score'])
         
-        # Sort by match score (descending)
-        jobs.sort(key=lambda x: x.get('match_score', 0), reverse=True)
+        # Sort by match score (descending); a stable sort keeps ties in input order
+        order = np.argsort(-np.array(match_scores), kind='stable')
+        jobs[:] = [jobs[i] for i in order]
         
         return jobs
     
@@ -95,8 +157,10 @@ class JobMatcher:
         
         # Add description
         if job.get('description'):
-            # Clean HTML tags if present
-            description = re.sub(r'<[^>]+>', '', job['description'])
+            # Clean HTML tags if present; plain-text descriptions skip the regex
+            description = job['description']
+            if '<' in description:
+                description = HTML_TAG_RE.sub('', description)
             text_parts.append(description)
         
         # Add company (for context)
@@ -105,65 +169,61 @@ class JobMatcher:
         
         return ' '.join(text_parts)
     
-    def _calculate_tfidf_similarity(self, cv_text: str, job_text: str) -> float:
-        """Calculate cosine similarity using TF-IDF vectors."""
+    def _calculate_tfidf_similarities(self, cv_text: str, job_texts: List[str]) -> np.ndarray:
+        """
+        Calculate cosine similarity between the CV and each job using TF-IDF vectors.
+        
+        Texts are hashed into term counts without building a vocabulary, then
+        IDF weights are fitted once on the CV plus all job texts, so they
+        reflect the whole batch and the similarities come from a single
+        sparse matrix product.
+        """
+        if not job_texts:
+            return np.empty(0)
+        
         try:
-            # Fit and transform
-            tfidf_matrix = self.vectorizer.fit_transform([cv_text, job_text])
+            # Hash term counts, then weight them by this batch's IDF
+            counts = self.vectorizer.transform([cv_text] + job_texts)
+            tfidf_matrix = TfidfTransformer().fit_transform(counts)
             
-            # Calculate cosine similarity
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
+            # Rows are already L2-normalized, so cosine similarity is a
+            # sparse matrix-vector product against the CV row
+            similarities = (tfidf_matrix[1:] @ tfidf_matrix[0].T).toarray().ravel()
             
             # Convert to percentage
-            return similarity * 100
+            return similarities * 100
         
         except Exception as e:
             print(f"Error calculating TF-IDF similarity: {e}")
-            return 50.0  # Default neutral score
+            return np.full(len(job_texts), 50.0)  # Default neutral score
     
-    def _calculate_skill_match(self, cv_data: Dict, job: Dict) -> float:
-        """Calculate how many job-required skills are in CV."""
+    def _find_cv_skills(self, cv_data: Dict) -> Set[str]:
+        """Find which common skills appear in the CV text or its skills list."""
         cv_skills = [skill.lower() for skill in cv_data.get('skills', [])]
-        cv_text = cv_data.get('raw_text', '').lower()
+        cv_text = lower_text(cv_data.get('raw_text', ''))
         
+        return self._find_skills(cv_text) | self._find_skills(' '.join(cv_skills))
+    
+    def _calculate_skill_match(self, cv_skills_found: Set[str], description_lower: str) -> float:
+        """Calculate how many job-required skills are in CV."""
         # Extract skills mentioned in job description
-        job_text = job.get('description', '').lower()
-        
-        # Common technical skills to look for
-        common_skills = [
-            'python', 'java', 'javascript', 'c++', 'sql', 'nosql', 'mongodb',
-            'react', 'angular', 'vue', 'node.js', 'django', 'flask',
-            'aws', 'azure', 'gcp', 'docker', 'kubernetes', 'git',
-            'machine learning', 'data analysis', 'ai', 'deep learning',
-            'agile', 'scrum', 'jira', 'excel', 'powerpoint', 'communication',
-            'leadership', 'problem solving', 'project management'
-        ]
-        
-        job_required_skills = [skill for skill in common_skills if skill in job_text]
+        job_required_skills = self._find_skills(description_lower)
         
         if not job_required_skills:
             return 70.0  # Neutral score if can't extract skills
         
         # Count how many required skills are in CV
-        matched_skills = 0
-        for skill in job_required_skills:
-            if skill in cv_text or skill in ' '.join(cv_skills):
-                matched_skills += 1
+        matched_skills = len(job_required_skills & cv_skills_found)
         
         # Calculate percentage
         match_percentage = (matched_skills / len(job_required_skills)) * 100
         
         return match_percentage
     
-    def _calculate_experience_match(self, cv_data: Dict, job: Dict) -> float:
-        """Estimate if experience level matches job requirements."""
-        # Count years of experience mentioned in CV
-        cv_text = cv_data.get('raw_text', '')
-        experience_years = self._extract_years_of_experience(cv_text)
-        
+    def _calculate_experience_match(self, experience_years: int, description_lower: str) -> float:
+        """Estimate if the CV's years of experience match the job requirements."""
         # Extract required years from job description
-        job_text = job.get('description', '')
-        required_years = self._extract_required_years(job_text)
+        required_years = self._extract_required_years(description_lower)
         
         if required_years is None:
             return 75.0  # Neutral score if can't determine
@@ -187,53 +247,44 @@ class JobMatcher:
     
     def _extract_years_of_experience(self, text: str) -> int:
         """Extract years of experience from CV text."""
-        # Look for patterns like "5 years experience", "5+ years"
-        patterns = [
-            r'(\d+)\+?\s*years?\s*(?:of\s*)?(?:experience|exp)',
-            r'(?:experience|exp).*?(\d+)\+?\s*years?'
-        ]
+        text_lower = lower_text(text)
         
-        years = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text.lower())
-            years.extend([int(m) for m in matches])
+        # Look for patterns like "5 years experience", "5+ years"
+        most_years = max(
+            (int(before or after) for before, after in CV_YEARS_RE.findall(text_lower)),
+            default=None
+        )
         
         # Return max years found, or estimate from date ranges
-        if years:
-            return max(years)
+        if most_years is not None:
+            return most_years
         
         # Alternatively, count date ranges (YYYY - YYYY)
-        date_ranges = re.findall(r'(\d{4})\s*[-–]\s*(\d{4}|present|current)', text.lower())
-        if date_ranges:
-            total_years = sum([
-                (2024 if end in ['present', 'current'] else int(end)) - int(start)
-                for start, end in date_ranges
-            ])
+        total_years = 0
+        found_range = False
+        for match in DATE_RANGE_RE.finditer(text_lower):
+            start, end = match.groups()
+            total_years += (2024 if end in ('present', 'current') else int(end)) - int(start)
+            found_range = True
+        if found_range:
             return max(total_years, 1)
         
         return 2  # Default assumption: 2 years
     
-    def _extract_required_years(self, job_text: str) -> int:
-        """Extract required years of experience from job description."""
+    def _extract_required_years(self, job_text_lower: str) -> int:
+        """Extract required years of experience from a lowercased job description."""
         # Look for patterns like "5+ years required", "minimum 3 years"
-        patterns = [
-            r'(\d+)\+?\s*years?\s*(?:of\s*)?(?:experience|exp).*?(?:required|needed|minimum)',
-            r'(?:required|needed|minimum).*?(\d+)\+?\s*years?',
-            r'(\d+)\+?\s*years?\s*(?:in|of|with)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, job_text.lower())
+        for pattern in JOB_YEARS_RES:
+            match = pattern.search(job_text_lower)
             if match:
                 return int(match.group(1))
         
-        # Check for seniority levels
-        if any(term in job_text.lower() for term in ['senior', 'lead', 'principal']):
-            return 5
-        elif any(term in job_text.lower() for term in ['mid-level', 'intermediate']):
-            return 3
-        elif any(term in job_text.lower() for term in ['junior', 'entry', 'graduate']):
-            return 1
+        # Check for seniority levels, finding every term in one scan
+        seniority_found = self._find_seniority(job_text_lower)
+        if seniority_found:
+            for terms, years in SENIORITY_YEARS:
+                if not seniority_found.isdisjoint(terms):
+                    return years
         
         return None  # Can't determine
 
@@ -3,112 +3,297 @@ Agent 6: Job Ranker and Filter
 Applies user filters and ranks jobs by relevance.
 """
 
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Pattern, Tuple
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import compress
+from operator import methodcaller
 import re
+import numpy as np
+from agents.term_matcher import build_term_matcher
+
+try:
+    from numba import njit
+except ImportError:  # Numeric filters fall back to plain NumPy
+    njit = None
+
+
+# A single filter criterion applied to one job
+JobPredicate = Callable[[Dict], bool]
+
+# Separators dropped before comparing employment types, so "full-time",
+# "full_time" and "FULLTIME" all compare equal
+CONTRACT_TYPE_SEPARATOR_RE = re.compile(r'[^a-z0-9]+')
+
+# Any mention of a work mode in lowercased text; jobs without one pass
+# every work-mode filter
+WORK_MODE_MENTION_RE = re.compile('remote|hybrid|on-site|onsite|office')
+
+
+@lru_cache(maxsize=64)
+def _work_modes_pattern(work_modes: Tuple[str, ...]) -> Pattern:
+    """Compile one alternation over the requested (lowercase) work modes."""
+    return re.compile('|'.join(map(re.escape, work_modes)))
+
+
+def _lowered(job: Dict, cached_key: str, field: str) -> str:
+    """A lowercased job field, using the copy JobAggregator stored when present."""
+    lowered = job.get(cached_key)
+    if lowered is None:
+        lowered = job.get(field, '').lower()
+    return lowered
+
+
+# API dates are nearly always ISO-8601; anything else tries these formats
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y', '%m/%d/%Y')
+
+
+@lru_cache(maxsize=4096)
+def _parse_date_string(date_str: str) -> Optional[datetime]:
+    """
+    Parse a non-empty posting date, cached because jobs from the same day
+    share the same strings.
+    
+    ISO-looking strings go straight to fromisoformat; others skip it until
+    the strptime formats have failed, since it rarely accepts them.
+    """
+    iso_like = ISO_DATE_RE.match(date_str) is not None
+    if iso_like:
+        try:
+            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+    
+    # Try common formats
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str[:10], fmt)
+        except ValueError:
+            continue
+    
+    # fromisoformat also accepts compact forms such as 20241215
+    if not iso_like:
+        try:
+            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        except ValueError:
+            pass
+    
+    return None
+
+
+def _created_timestamp(job: Dict) -> Optional[int]:
+    """
+    Epoch seconds of a job's posting date, or None if missing or unparseable.
+    
+    Parsed once and stored on the job as _created_ts, so later filter and
+    sort passes compare integers; naive and timezone-aware dates also
+    compare correctly this way.
+    """
+    if '_created_ts' in job:
+        return job['_created_ts']
+    
+    created_str = job.get('created')
+    timestamp = None
+    if created_str:
+        job_date = _parse_date_string(created_str)
+        if job_date is not None:
+            try:
+                timestamp = int(job_date.timestamp())
+            except (OverflowError, OSError, ValueError):
+                pass
+    
+    job['_created_ts'] = timestamp
+    return timestamp
+
+
+# Sort keys for each sort_by option, read once per job; every sort is
+# descending and missing values sort as 0
+SORT_KEYS = {
+    'match_score': methodcaller('get', 'match_score'),
+    'date': _created_timestamp,
+    'salary': methodcaller('get', 'salary_max'),
+}
+
+
+def _numeric_column(jobs: List[Dict], value: Callable[[Dict], Optional[float]]) -> np.ndarray:
+    """Collect one numeric field across jobs as float64, with NaN where it is missing."""
+    return np.fromiter(
+        (np.nan if v is None else v for v in map(value, jobs)),
+        dtype=np.float64,
+        count=len(jobs)
+    )
+
+
+def _filter_kernel(created, undated, salary_min, salary_max, scores, distance,
+                   cutoff_ts, min_salary, max_salary, min_score, max_distance):
+    """Single pass over the numeric columns; inactive filters get infinite thresholds."""
+    n = created.shape[0]
+    mask = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        mask[i] = (
+            (created[i] >= cutoff_ts or undated[i])
+            and not salary_max[i] < min_salary
+            and not salary_min[i] > max_salary
+            and scores[i] >= min_score
+            and not distance[i] > max_distance
+        )
+    return mask
+
+
+if njit is not None:
+    _filter_kernel = njit(cache=True)(_filter_kernel)
 
 
 class JobRanker:
     """Filters and ranks jobs based on user preferences."""
     
-    def __init__(self):
-        self.valid_job_types = ['full-time', 'part-time', 'contract', 'temporary', 'internship', 'apprenticeship']
-        self.valid_work_modes = ['remote', 'hybrid', 'on-site', 'onsite']
+    VALID_JOB_TYPES = frozenset({'full-time', 'part-time', 'contract', 'temporary', 'internship', 'apprenticeship'})
+    VALID_WORK_MODES = frozenset({'remote', 'hybrid', 'on-site', 'onsite'})
     
-    def filter_and_rank(self, jobs: List[Dict], filters: Dict) -> List[Dict]:
+    def filter_and_rank(self, jobs: List[Dict], filters: Dict, top_k: Optional[int] = None) -> List[Dict]:
         """
         Apply filters and rank jobs.
         
         Args:
             jobs: List of job dictionaries with match_scores
             filters: Dictionary of filter criteria
+            top_k: Optional cap on the number of ranked jobs returned
             
         Returns:
             Filtered and ranked jobs
         """
-        filtered_jobs = jobs.copy()
-        
-        # Apply each filter
-        if filters.get('job_types'):
-            filtered_jobs = self._filter_by_job_type(filtered_jobs, filters['job_types'])
-        
-        if filters.get('work_modes'):
-            filtered_jobs = self._filter_by_work_mode(filtered_jobs, filters['work_modes'])
-        
-        if filters.get('date_posted'):
-            filtered_jobs = self._filter_by_date(filtered_jobs, filters['date_posted'])
+        if not jobs:
+            return []
         
-        if filters.get('salary_min') is not None or filters.get('salary_max') is not None:
-            filtered_jobs = self._filter_by_salary(
-                filtered_jobs,
-                filters.get('salary_min'),
-                filters.get('salary_max')
+        # Numeric filters are combined into one vectorized mask; the text
+        # filters become predicates checked only on jobs the mask keeps
+        keep = self._numeric_mask(jobs, filters)
+        predicates = [
+            predicate for predicate in (
+                self._job_type_predicate(filters.get('job_types')),
+                self._work_mode_predicate(filters.get('work_modes')),
             )
-        
-        if filters.get('min_match_score'):
-            filtered_jobs = self._filter_by_match_score(filtered_jobs, filters['min_match_score'])
-        
-        if filters.get('max_distance_miles'):
-            filtered_jobs = self._filter_by_distance(filtered_jobs, filters['max_distance_miles'])
+            if predicate is not None
+        ]
+        # The only list built is the result, so the caller's list is never mutated
+        candidates = jobs if keep is None else compress(jobs, keep)
+        filtered_jobs = [job for job in candidates if all(predicate(job) for predicate in predicates)]
         
         # Rank by sort criteria
         sort_by = filters.get('sort_by', 'match_score')  # Default: match score
-        filtered_jobs = self._sort_jobs(filtered_jobs, sort_by)
+        filtered_jobs = self._sort_jobs(filtered_jobs, sort_by, top_k)
         
         return filtered_jobs
     
-    def _filter_by_job_type(self, jobs: List[Dict], job_types: List[str]) -> List[Dict]:
-        """Filter by employment type (full-time, part-time, etc.)."""
+    def _job_type_predicate(self, job_types: List[str]) -> Optional[JobPredicate]:
+        """Predicate for employment type (full-time, part-time, etc.), or None if unset."""
         if not job_types:
-            return jobs
+            return None
         
-        job_types_lower = [jt.lower() for jt in job_types]
+        # One scan per job finds any requested type inside the contract type
+        find_job_types = build_term_matcher(
+            tuple(CONTRACT_TYPE_SEPARATOR_RE.sub('', jt.lower()) for jt in job_types)
+        )
         
-        filtered = []
-        for job in jobs:
-            contract_type = job.get('contract_type', '').lower()
+        def matches(job: Dict) -> bool:
+            contract_type = _lowered(job, '_contract_lc', 'contract_type')
             
-            # Check if any job type matches
-            if any(jt in contract_type for jt in job_types_lower):
-                filtered.append(job)
-            elif not contract_type or contract_type == 'not specified':
-                # Include jobs with unspecified type
-                filtered.append(job)
+            # Check if any job type matches, including jobs with unspecified type
+            return (
+                not contract_type
+                or contract_type == 'not specified'
+                or bool(find_job_types(CONTRACT_TYPE_SEPARATOR_RE.sub('', contract_type)))
+            )
         
-        return filtered
+        return matches
     
-    def _filter_by_work_mode(self, jobs: List[Dict], work_modes: List[str]) -> List[Dict]:
-        """Filter by remote/hybrid/on-site."""
+    def _work_mode_predicate(self, work_modes: List[str]) -> Optional[JobPredicate]:
+        """Predicate for remote/hybrid/on-site, or None if unset."""
         if not work_modes:
-            return jobs
+            return None
         
-        work_modes_lower = [wm.lower() for wm in work_modes]
+        # One scan per job of the lowercased text instead of probing each
+        # mode separately
+        modes_re = _work_modes_pattern(tuple(wm.lower() for wm in work_modes))
         
-        filtered = []
-        for job in jobs:
-            description = job.get('description', '').lower()
-            title = job.get('title', '').lower()
-            combined_text = description + ' ' + title
+        def matches(job: Dict) -> bool:
+            combined_text = _lowered(job, '_desc_lc', 'description') + ' ' + _lowered(job, '_title_lc', 'title')
             
-            # Check if any work mode is mentioned
-            matches = False
-            for mode in work_modes_lower:
-                if mode in combined_text:
-                    matches = True
-                    break
-            
-            if matches:
-                filtered.append(job)
-            elif not any(mode in combined_text for mode in ['remote', 'hybrid', 'on-site', 'onsite', 'office']):
-                # Include if work mode not specified
-                filtered.append(job)
+            # Check if any work mode is mentioned; include if work mode not specified
+            return modes_re.search(combined_text) is not None or WORK_MODE_MENTION_RE.search(combined_text) is None
         
-        return filtered
+        return matches
     
-    def _filter_by_date(self, jobs: List[Dict], date_posted: str) -> List[Dict]:
-        """Filter by posting date (last 24h, 3 days, 7 days, etc.)."""
+    def _numeric_mask(self, jobs: List[Dict], filters: Dict) -> Optional[np.ndarray]:
+        """
+        Boolean mask of jobs passing the date, salary, match score and
+        distance filters, or None if none of them is set.
+        
+        Missing values are NaN, and NaN comparisons are False, so jobs
+        without the relevant field are kept. Only active filters read their
+        column from the jobs; the rest get zeros and an infinite threshold.
+        """
+        cutoff_ts = self._date_cutoff(filters.get('date_posted'))
+        min_salary = filters.get('salary_min')
+        max_salary = filters.get('salary_max')
+        min_score = filters.get('min_match_score')
+        max_distance = filters.get('max_distance_miles')
+        if cutoff_ts is None and min_salary is None and max_salary is None and not min_score and not max_distance:
+            return None
+        
+        n = len(jobs)
+        zeros = np.zeros(n)
+        
+        # Posting date (last 24h, 3 days, 7 days, etc.); include if date not
+        # available, drop unparseable dates
+        if cutoff_ts is not None:
+            created = _numeric_column(jobs, _created_timestamp)
+            undated = np.fromiter((not job.get('created') for job in jobs), dtype=bool, count=n)
+        else:
+            cutoff_ts = -np.inf
+            created = zeros
+            undated = np.zeros(n, dtype=bool)
+        
+        # Salary range overlap; jobs with no salary info are included
+        if min_salary is not None:
+            salary_max = _numeric_column(jobs, lambda job: job.get('salary_max'))
+        else:
+            min_salary, salary_max = -np.inf, zeros
+        if max_salary is not None:
+            salary_min = _numeric_column(jobs, lambda job: job.get('salary_min'))
+        else:
+            max_salary, salary_min = np.inf, zeros
+        
+        # Minimum match score
+        if min_score:
+            scores = _numeric_column(jobs, lambda job: job.get('match_score', 0))
+        else:
+            min_score, scores = -np.inf, zeros
+        
+        # Maximum distance from location
+        if max_distance:
+            distance = _numeric_column(jobs, lambda job: job.get('distance'))
+        else:
+            max_distance, distance = np.inf, zeros
+        
+        thresholds = (float(cutoff_ts), float(min_salary), float(max_salary), float(min_score), float(max_distance))
+        if njit is not None:
+            return _filter_kernel(created, undated, salary_min, salary_max, scores, distance, *thresholds)
+        
+        cutoff_ts, min_salary, max_salary, min_score, max_distance = thresholds
+        return (
+            ((created >= cutoff_ts) | undated)
+            & ~(salary_max < min_salary)
+            & ~(salary_min > max_salary)
+            & (scores >= min_score)
+            & ~(distance > max_distance)
+        )
+    
+    def _date_cutoff(self, date_posted: str) -> Optional[int]:
+        """Epoch seconds of the oldest allowed posting date, or None if unset."""
         if not date_posted or date_posted == 'any':
-            return jobs
+            return None
         
         # Define cutoff dates
         now = datetime.now()
@@ -122,112 +307,29 @@ class JobRanker:
         
         cutoff = cutoff_map.get(date_posted)
         if not cutoff:
-            return jobs
-        
-        filtered = []
-        for job in jobs:
-            created_str = job.get('created', '')
-            
-            try:
-                # Try parsing different date formats
-                job_date = self._parse_date(created_str)
-                
-                if job_date and job_date >= cutoff:
-                    filtered.append(job)
-                elif not created_str:
-                    # Include if date not available
-                    filtered.append(job)
-            except:
-                # Include if can't parse date
-                filtered.append(job)
-        
-        return filtered
-    
-    def _filter_by_salary(self, jobs: List[Dict], min_salary: float, max_salary: float) -> List[Dict]:
-        """Filter by salary range."""
-        if min_salary is None and max_salary is None:
-            return jobs
-        
-        filtered = []
-        for job in jobs:
-            job_min = job.get('salary_min')
-            job_max = job.get('salary_max')
-            
-            # If job has no salary info, include it
-            if job_min is None and job_max is None:
-                filtered.append(job)
-                continue
-            
-            # Check if salary range overlaps with filter
-            passes = True
-            if min_salary is not None and job_max is not None:
-                if job_max < min_salary:
-                    passes = False
-            
-            if max_salary is not None and job_min is not None:
-                if job_min > max_salary:
-                    passes = False
-            
-            if passes:
-                filtered.append(job)
-        
-        return filtered
-    
-    def _filter_by_match_score(self, jobs: List[Dict], min_score: float) -> List[Dict]:
-        """Filter by minimum match score."""
-        return [job for job in jobs if job.get('match_score', 0) >= min_score]
-    
-    def _filter_by_distance(self, jobs: List[Dict], max_distance: float) -> List[Dict]:
-        """Filter by maximum distance from location."""
-        filtered = []
-        for job in jobs:
-            distance = job.get('distance')
-            
-            if distance is None:
-                # Include jobs without distance info
-                filtered.append(job)
-            elif distance <= max_distance:
-                filtered.append(job)
-        
-        return filtered
-    
-    def _sort_jobs(self, jobs: List[Dict], sort_by: str) -> List[Dict]:
-        """Sort jobs by specified criterion."""
-        if sort_by == 'match_score':
-            jobs.sort(key=lambda x: x.get('match_score', 0), reverse=True)
-        elif sort_by == 'date':
-            jobs.sort(key=lambda x: x.get('created', ''), reverse=True)
-        elif sort_by == 'salary':
-            jobs.sort(key=lambda x: x.get('salary_max', 0) or 0, reverse=True)
-        
-        return jobs
-    
-    def _parse_date(self, date_str: str) -> datetime:
-        """Parse various date formats."""
-        if not date_str:
             return None
         
-        # Try ISO format
-        try:
-            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        except:
-            pass
+        return int(cutoff.timestamp())
+    
+    def _sort_jobs(self, jobs: List[Dict], sort_by: str, top_k: Optional[int] = None) -> List[Dict]:
+        """Sort jobs by specified criterion, keeping only the best top_k if given."""
+        # A non-positive cap keeps nothing rather than slicing from the end
+        if top_k is not None and top_k <= 0:
+            return []
         
-        # Try common formats
-        formats = [
-            '%Y-%m-%d',
-            '%Y-%m-%dT%H:%M:%S',
-            '%d/%m/%Y',
-            '%m/%d/%Y'
-        ]
+        key = SORT_KEYS.get(sort_by)
         
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str[:10], fmt)
-            except:
-                continue
+        # Nothing to reorder with fewer than two jobs
+        if key is not None and len(jobs) > 1:
+            # Stable argsort on the negated keys sorts descending while keeping
+            # ties in input order
+            keys = np.nan_to_num(_numeric_column(jobs, key), nan=0.0)
+            order = np.argsort(-keys, kind='stable')
+            jobs = [jobs[i] for i in order[:top_k]]
+        elif top_k is not None:
+            jobs = jobs[:top_k]
         
-        return None
+        return jobs
 
 
 # Example usage
@@ -0,0 +1,40 @@
+"""
+Process-wide OpenAI clients shared by the agents that call GPT.
+One client per process means one HTTP connection pool, so TLS handshakes
+are paid once rather than per agent instance.
+"""
+
+import os
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Pool and timeout settings for OpenAI requests; the short connect timeout
+# keeps a slow handshake from wedging a worker
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """Return the shared synchronous OpenAI client."""
+    return OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        timeout=HTTP_TIMEOUT,
+        http_client=httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_client() -> AsyncOpenAI:
+    """Return the shared asynchronous OpenAI client."""
+    return AsyncOpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        timeout=HTTP_TIMEOUT,
+        http_client=httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    )
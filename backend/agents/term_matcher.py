@@ -0,0 +1,63 @@
+"""
+Multi-term substring matching shared by the agents that look for known
+skills, keywords or verbs in CV and job text, plus the lowercasing of CV
+text they all scan.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Set, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # Fall back to a compiled regex alternation
+    ahocorasick = None
+
+
+@lru_cache(maxsize=128)
+def build_term_matcher(terms: Tuple[str, ...]) -> Callable[[str], Set[str]]:
+    """
+    Build a function returning which of the (lowercase) terms occur in a text.
+    
+    The text is scanned once regardless of how many terms there are. Matchers
+    are cached per term tuple, so a job's target keywords are only compiled once.
+    """
+    words = [term for term in dict.fromkeys(terms) if term]
+    always_found = {''} if '' in terms else set()
+    
+    if not words:
+        return lambda text_lower: set(always_found)
+    
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for word in words:
+            automaton.add_word(word, word)
+        automaton.make_automaton()
+        
+        def find_terms(text_lower: str) -> Set[str]:
+            return {word for _, word in automaton.iter(text_lower)} | always_found
+    else:
+        # Zero-width lookahead tries every start position, longest term first;
+        # shorter terms hidden inside a match are recovered via substrings
+        longest_first = sorted(words, key=len, reverse=True)
+        pattern = re.compile('(?=(' + '|'.join(map(re.escape, longest_first)) + '))')
+        substrings = {word: {other for other in words if other in word} for word in words}
+        
+        def find_terms(text_lower: str) -> Set[str]:
+            found = set(always_found)
+            for word in set(pattern.findall(text_lower)):
+                found |= substrings[word]
+            return found
+    
+    return find_terms
+
+
+@lru_cache(maxsize=32)
+def lower_text(text: str) -> str:
+    """
+    Lowercase a CV's raw text, remembering recent results.
+    
+    The ATS analyzer, improvement advisor and job matcher all scan the same
+    raw_text object, so only the first of them pays for the copy.
+    """
+    return text.lower()
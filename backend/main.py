@@ -5,15 +5,26 @@ Main application file with API endpoints for all agents.
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Tuple
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
 import os
-import shutil
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 # Import all agents
-from agents.cv_parser import CVParser
+from agents.cv_parser import parse_file
 from agents.ats_analyzer import ATSAnalyzer
 from agents.improvement_advisor import ImprovementAdvisor
 from agents.job_aggregator import JobAggregator
@@ -22,36 +33,160 @@ from agents.job_ranker import JobRanker
 from agents.cover_letter_generator import CoverLetterGenerator
 from agents.application_tracker import ApplicationTracker
 
+# ORJSONResponse imports fine without orjson and only fails when rendering,
+# so check for orjson itself before making it the default
+if importlib.util.find_spec('orjson') is not None:
+    DefaultResponse = ORJSONResponse
+else:  # Fall back to the stdlib encoder
+    DefaultResponse = JSONResponse
+
+# Origins allowed to call the API, comma-separated; defaults to the Vite dev server
+FRONTEND_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv('FRONTEND_ORIGINS', 'http://localhost:3000').split(',')
+    if origin.strip()
+]
+
+# Per-request progress is logged at DEBUG, so it costs nothing unless enabled
+logger = logging.getLogger(__name__)
+
+# CV parsing is CPU-bound, so it runs in worker processes off the event loop
+CV_PARSE_WORKERS = 2
+
+# Number of parsed CV file versions kept for reuse
+CV_PARSE_CACHE_SIZE = 32
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the agents and run the CV parse pool for the lifetime of the app."""
+    global ats_analyzer, improvement_advisor, job_aggregator, job_matcher
+    global job_ranker, cover_letter_generator, application_tracker
+    
+    # Agents are built here rather than at import, because parse workers
+    # re-import this module and must not open the database or HTTP clients
+    ats_analyzer = ATSAnalyzer()
+    improvement_advisor = ImprovementAdvisor()
+    job_aggregator = JobAggregator()
+    job_matcher = JobMatcher()
+    job_ranker = JobRanker()
+    cover_letter_generator = CoverLetterGenerator()
+    application_tracker = ApplicationTracker()
+    
+    # Workers come from a forkserver (spawn where unavailable) rather than
+    # forking this process, whose running threads can deadlock a fork
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        mp_context = multiprocessing.get_context('forkserver')
+        mp_context.set_forkserver_preload(['agents.cv_parser'])
+    else:
+        mp_context = multiprocessing.get_context('spawn')
+    
+    app.state.cv_parse_pool = ProcessPoolExecutor(max_workers=CV_PARSE_WORKERS, mp_context=mp_context)
+    try:
+        yield
+    finally:
+        app.state.cv_parse_pool.shutdown(cancel_futures=True)
+        application_tracker.close()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="JobMatchAI API",
     description="Multi-agent job search and application assistant",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DefaultResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origin
+    allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-# Initialize agents
-cv_parser = CVParser()
-ats_analyzer = ATSAnalyzer()
-improvement_advisor = ImprovementAdvisor()
-job_aggregator = JobAggregator()
-job_matcher = JobMatcher()
-job_ranker = JobRanker()
-cover_letter_generator = CoverLetterGenerator()
-application_tracker = ApplicationTracker()
+# Compress larger responses such as job search results
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Agents, built by lifespan when the app starts (CV parsing runs in the
+# worker pool via agents.cv_parser.parse_file)
+ats_analyzer: ATSAnalyzer
+improvement_advisor: ImprovementAdvisor
+job_aggregator: JobAggregator
+job_matcher: JobMatcher
+job_ranker: JobRanker
+cover_letter_generator: CoverLetterGenerator
+application_tracker: ApplicationTracker
 
 # Create uploads directory
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Copy uploads to disk in 1 MB chunks
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def save_upload(file: UploadFile) -> Path:
+    """
+    Write an uploaded file to disk, named by the SHA-256 of its content, and
+    return its path. Blocking, so endpoints run it in the threadpool.
+    
+    Content that is already stored is not written again, so the file keeps
+    its mtime and its cached parse stays valid.
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, delete=False) as buffer:
+        try:
+            while chunk := file.file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                buffer.write(chunk)
+        except BaseException:
+            os.unlink(buffer.name)
+            raise
+    
+    file_path = UPLOAD_DIR / f"{digest.hexdigest()}{Path(file.filename).suffix.lower()}"
+    if file_path.exists():
+        os.unlink(buffer.name)
+    else:
+        os.replace(buffer.name, file_path)
+    return file_path
+
+
+def public_job(job: Dict) -> Dict:
+    """Drop the underscore fields agents cache on a job before it is returned."""
+    return {key: value for key, value in job.items() if not key.startswith('_')}
+
+
+# Parse futures keyed by (path, mtime_ns, size), least recently used first;
+# only touched from the event loop, so no lock is needed
+_cv_parses: "OrderedDict[Tuple[str, int, int], Future]" = OrderedDict()
+
+
+async def parse_cv(cv_path: Path) -> Dict:
+    """Parse a saved CV in the worker pool, reusing the previous parse until the file changes."""
+    stat = cv_path.stat()
+    key = (str(cv_path), stat.st_mtime_ns, stat.st_size)
+    
+    future = _cv_parses.get(key)
+    if future is None:
+        future = app.state.cv_parse_pool.submit(parse_file, key[0])
+        _cv_parses[key] = future
+        if len(_cv_parses) > CV_PARSE_CACHE_SIZE:
+            _cv_parses.popitem(last=False)
+    else:
+        _cv_parses.move_to_end(key)
+    
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception:
+        # Drop only this file version so the next request retries it
+        if _cv_parses.get(key) is future:
+            del _cv_parses[key]
+        raise
+
+
 #  Pydantic models for request/response
 class JobSearchRequest(BaseModel):
     job_title: str
@@ -59,6 +194,8 @@ class JobSearchRequest(BaseModel):
     radius_miles: int = 20
     filters: Optional[Dict] = None
     max_results: int = 50
+    force_refresh: bool = False
+    limit: Optional[int] = Field(None, ge=1)
 
 class GenerateCoverLetterRequest(BaseModel):
     job: Dict
@@ -88,52 +225,49 @@ async def upload_cv(file: UploadFile = File(...)):
     Upload and parse CV file.
     Returns parsed CV data and ATS analysis.
     """
-    print(f"=== CV Upload Started ===")
-    print(f"Filename: {file.filename}")
+    logger.debug("CV upload started: %s", file.filename)
     
     # Validate file type
     if not file.filename.lower().endswith(('.pdf', '.docx')):
         raise HTTPException(status_code=400, detail="Only PDF and DOCX files are supported")
     
     # Save uploaded file
-    file_path = UPLOAD_DIR / file.filename
     try:
-        print(f"Saving file to: {file_path}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        print(f"File saved successfully")
+        file_path = await run_in_threadpool(save_upload, file)
+        logger.debug("File saved to: %s", file_path)
     except Exception as e:
-        print(f"ERROR saving file: {e}")
+        logger.error("Error saving file: %s", e)
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
     
     # Parse CV (Agent 1)
     try:
-        print(f"Parsing CV...")
-        cv_data = cv_parser.parse(str(file_path))
-        print(f"CV parsed successfully. Skills found: {len(cv_data.get('skills', []))}")
+        logger.debug("Parsing CV")
+        cv_data = await parse_cv(file_path)
+        logger.debug("CV parsed successfully. Skills found: %d", len(cv_data.get('skills', [])))
     except Exception as e:
-        print(f"ERROR parsing CV: {e}")
+        logger.error("Error parsing CV: %s", e)
         raise HTTPException(status_code=500, detail=f"Error parsing CV: {str(e)}")
     
     # Analyze ATS score (Agent 2)
     try:
-        print(f"Analyzing ATS score...")
-        ats_result = ats_analyzer.analyze(cv_data)
-        print(f"ATS Score: {ats_result.get('total_score')}")
+        logger.debug("Analyzing ATS score")
+        ats_result = await ats_analyzer.analyze_async(cv_data)
+        logger.debug("ATS score: %s", ats_result.get('total_score'))
     except Exception as e:
-        print(f"ERROR analyzing CV: {e}")
+        logger.error("Error analyzing CV: %s", e)
         raise HTTPException(status_code=500, detail=f"Error analyzing CV: {str(e)}")
     
     # Track CV upload
     try:
-        application_tracker.record_cv_upload(file.filename, ats_result['total_score'])
+        await run_in_threadpool(application_tracker.record_cv_upload, file.filename, ats_result['total_score'])
     except Exception as e:
-        print(f"WARNING: Could not track CV upload: {e}")
+        logger.warning("Could not track CV upload: %s", e)
     
-    print(f"=== CV Upload Complete ===")
+    logger.debug("CV upload complete: %s", file.filename)
     return {
         "success": True,
         "filename": file.filename,
+        "cv_file": file_path.name,
         "cv_data": cv_data,
         "ats_result": ats_result
     }
@@ -145,14 +279,12 @@ async def analyze_cv(file: UploadFile = File(...), job_title: str = ""):
     Analyze CV and provide improvement suggestions.
     """
     # Parse CV
-    file_path = UPLOAD_DIR / file.filename
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_path = await run_in_threadpool(save_upload, file)
     
-    cv_data = cv_parser.parse(str(file_path))
+    cv_data = await parse_cv(file_path)
     
     # Analyze ATS (Agent 2)
-    ats_result = ats_analyzer.analyze(cv_data, target_keywords=None)
+    ats_result = await ats_analyzer.analyze_async(cv_data, target_keywords=None)
     
     # Get improvement advice (Agent 3)
     advice = improvement_advisor.generate_advice(ats_result, cv_data, job_title)
@@ -171,11 +303,12 @@ async def search_jobs(request: JobSearchRequest, cv_file: Optional[str] = None):
     """
     try:
         # Fetch jobs from APIs (Agent 4)
-        jobs = job_aggregator.fetch_all_jobs(
+        jobs = await job_aggregator.fetch_all_jobs_async(
             job_title=request.job_title,
             location=request.location,
             radius_miles=request.radius_miles,
-            max_results=request.max_results
+            max_results=request.max_results,
+            force_refresh=request.force_refresh
         )
         
         if not jobs:
@@ -190,16 +323,18 @@ async def search_jobs(request: JobSearchRequest, cv_file: Optional[str] = None):
         if cv_file:
             cv_path = UPLOAD_DIR / cv_file
             if cv_path.exists():
-                cv_data = cv_parser.parse(str(cv_path))
-                jobs = job_matcher.match_jobs(cv_data, jobs)
+                cv_data = await parse_cv(cv_path)
+                jobs = await run_in_threadpool(job_matcher.match_jobs, cv_data, jobs)
         
         # Apply filters and rank (Agent 6)
-        if request.filters:
-            jobs = job_ranker.filter_and_rank(jobs, request.filters)
+        if request.filters or request.limit is not None:
+            jobs = await run_in_threadpool(
+                job_ranker.filter_and_rank, jobs, request.filters or {}, top_k=request.limit
+            )
         
         return {
             "success": True,
-            "jobs": jobs,
+            "jobs": [public_job(job) for job in jobs],
             "total_jobs": len(jobs),
             "filters_applied": request.filters is not None
         }
@@ -219,10 +354,10 @@ async def generate_cover_letter(request: GenerateCoverLetterRequest):
         if request.cv_file:
             cv_path = UPLOAD_DIR / request.cv_file
             if cv_path.exists():
-                cv_data = cv_parser.parse(str(cv_path))
+                cv_data = await parse_cv(cv_path)
         
         # Generate cover letter (Agent 7)
-        result = cover_letter_generator.generate(cv_data, request.job, request.tone)
+        result = await cover_letter_generator.generate_async(cv_data, request.job, request.tone)
         
         return result
     
@@ -237,7 +372,7 @@ async def track_application(request: TrackApplicationRequest):
     """
     try:
         # Track application (Agent 8)
-        app_id = application_tracker.track_application(request.job, request.notes)
+        app_id = await run_in_threadpool(application_tracker.track_application, request.job, request.notes)
         
         return {
             "success": True,
@@ -255,7 +390,7 @@ async def get_applications():
     Get all tracked applications.
     """
     try:
-        applications = application_tracker.get_all_applications()
+        applications = await run_in_threadpool(application_tracker.get_all_applications)
         
         return {
             "success": True,
@@ -272,7 +407,7 @@ async def update_application_status(app_id: int, request: dict):
     """Update the status of an application."""
     try:
         new_status = request.get('status')
-        success = application_tracker.update_application_status(app_id, new_status)
+        success = await run_in_threadpool(application_tracker.update_application_status, app_id, new_status)
         
         if success:
             return {"success": True, "status": new_status}
@@ -288,7 +423,7 @@ async def get_dashboard_stats():
     Get analytics for dashboard.
     """
     try:
-        stats = application_tracker.get_application_stats()
+        stats = await run_in_threadpool(application_tracker.get_application_stats)
         
         return {
             "success": True,
@@ -305,7 +440,7 @@ async def check_if_applied(job: Dict):
     Check if user has already applied to this job.
     """
     try:
-        has_applied = application_tracker.check_if_applied(job)
+        has_applied = await run_in_threadpool(application_tracker.check_if_applied, job)
         
         return {
             "success": True,
@@ -0,0 +1,48 @@
+"""
+Tests for JobAggregator's cross-provider deduplication.
+Run from backend/: python -m unittest discover tests
+"""
+
+import unittest
+
+from agents.job_aggregator import JobAggregator
+
+
+class DeduplicationTest(unittest.TestCase):
+    """Jobs are merged only when their normalized title and company match."""
+    
+    def setUp(self):
+        self.aggregator = JobAggregator()
+    
+    def unique_titles(self, jobs):
+        return [job['title'] for job in self.aggregator._unique_jobs([jobs])]
+    
+    def test_language_symbols_keep_jobs_distinct(self):
+        jobs = [
+            {'title': 'C++ Developer', 'company': 'Acme'},
+            {'title': 'C# Developer', 'company': 'Acme'},
+            {'title': 'C Developer', 'company': 'Acme'},
+        ]
+        self.assertEqual(self.unique_titles(jobs), ['C++ Developer', 'C# Developer', 'C Developer'])
+    
+    def test_punctuation_and_case_differences_merge(self):
+        jobs = [
+            {'title': 'Data Analyst', 'company': 'Google Inc.'},
+            {'title': 'data  analyst', 'company': 'Google, Inc'},
+        ]
+        self.assertEqual(self.unique_titles(jobs), ['Data Analyst'])
+    
+    def test_non_latin_titles_are_kept_and_distinct(self):
+        jobs = [
+            {'title': 'Разработчик', 'company': 'Яндекс'},
+            {'title': 'エンジニア', 'company': '株式会社'},
+        ]
+        self.assertEqual(self.unique_titles(jobs), ['Разработчик', 'エンジニア'])
+    
+    def test_jobs_without_title_or_company_are_dropped(self):
+        jobs = [{'title': '', 'company': ''}, {'title': None, 'company': None}]
+        self.assertEqual(self.unique_titles(jobs), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
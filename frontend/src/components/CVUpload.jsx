@@ -90,7 +90,7 @@ export default function CVUpload({ existingData, onUploadSuccess, onDeleteCV, on
             setResult(response.data)
             // Pass full data to parent to persist
             if (response.data.success && onUploadSuccess) {
-                onUploadSuccess(file.name, response.data.ats_result, response.data)
+                onUploadSuccess(response.data.cv_file, response.data.ats_result, response.data)
             }
         } catch (err) {
             setError(err.response?.data?.detail || 'Error uploading CV. Please try again.')